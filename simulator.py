@@ -6,9 +6,26 @@ Data from Texecom Sonos Pulse Sounder Beacon Wall Operations Manual
 import numpy as np
 import pygame
 import time
+import asyncio
 import re
+import os
+import sys
+import io
+import json
+import hashlib
+import heapq
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from math import gcd, isfinite
+from fractions import Fraction
 from typing import Optional, List, Tuple
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
 class AlertToneLookup:
     def __init__(self):
         # Define the tone data with all configurations
@@ -305,6 +322,298 @@ class AlertToneLookup:
         """Get all alert-related tones"""
         return self.search_by_description('alert')
 
+    def register_tone(self, tone_number, data):
+        """Add an externally defined tone alongside the built-in ones"""
+        if tone_number in self.tones:
+            raise ToneDefinitionError(f"Tone #{tone_number} is already defined")
+        self.tones[tone_number] = data
+
+
+# External tone definitions
+TONE_DEFINITION_FORMAT = 3
+TONE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'klaxon-sonos-simulator')
+SEGMENT_TYPES = ('sine', 'sweep', 'silence', 'repeat')
+TONE_INFO_FIELDS = ('frequency', 'description', 'dip_switches', 'pattern', 'standard')
+MAX_CADENCE_SEGMENTS = 10000  # after expanding repeat groups
+MAX_CADENCE_SECONDS = 600.0  # one period; longer loops belong in a ToneTimeline
+
+
+class ToneDefinitionError(ValueError):
+    """Raised when a tone definition file is malformed"""
+
+
+def _check_positive(value, what):
+    """Validate a positive number field from a tone definition"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not isfinite(value) or value <= 0:
+        raise ToneDefinitionError(f"{what} must be a positive finite number, got {value!r}")
+    return float(value)
+
+
+def _flatten_cadence(segments, where, nested=False):
+    """Validate cadence segments and expand repeat groups into a flat list"""
+    if not isinstance(segments, list) or not segments:
+        raise ToneDefinitionError(f"{where}: 'cadence' must be a non-empty list")
+
+    flat = []
+    for i, seg in enumerate(segments):
+        seg_where = f"{where} segment {i + 1}"
+        if not isinstance(seg, dict) or seg.get('type') not in SEGMENT_TYPES:
+            raise ToneDefinitionError(f"{seg_where}: 'type' must be one of {', '.join(SEGMENT_TYPES)}")
+
+        kind = seg['type']
+        if kind == 'repeat':
+            count = seg.get('count')
+            if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+                raise ToneDefinitionError(f"{seg_where}: repeat 'count' must be a positive integer")
+            inner = _flatten_cadence(seg.get('segments'), seg_where, nested=True)
+            if len(flat) + len(inner) * count > MAX_CADENCE_SEGMENTS:
+                raise ToneDefinitionError(f"{seg_where}: cadence expands to more than "
+                                          f"{MAX_CADENCE_SEGMENTS} segments")
+            flat.extend(inner * count)
+            continue
+
+        duration = seg.get('duration')
+        if duration is None:
+            # Only a lone sine may omit its duration (a continuous tone)
+            if kind != 'sine' or len(segments) != 1 or nested:
+                raise ToneDefinitionError(f"{seg_where}: 'duration' is required")
+        else:
+            duration = _check_positive(duration, f"{seg_where}: 'duration'")
+
+        if kind == 'sine':
+            freq = _check_positive(seg.get('frequency'), f"{seg_where}: 'frequency'")
+            flat.append(('sine', freq, freq, duration))
+        elif kind == 'sweep':
+            start = _check_positive(seg.get('start_frequency'), f"{seg_where}: 'start_frequency'")
+            end = _check_positive(seg.get('end_frequency'), f"{seg_where}: 'end_frequency'")
+            flat.append(('sweep', start, end, duration))
+        else:
+            flat.append(('silence', 0.0, 0.0, duration))
+        if len(flat) > MAX_CADENCE_SEGMENTS:
+            raise ToneDefinitionError(f"{where}: cadence has more than {MAX_CADENCE_SEGMENTS} segments")
+
+    if not nested and sum(segment[3] or 0.0 for segment in flat) > MAX_CADENCE_SECONDS:
+        raise ToneDefinitionError(f"{where}: cadence period is longer than {MAX_CADENCE_SECONDS:g} seconds")
+    return flat
+
+
+def parse_tone_definitions(data, source='<definitions>'):
+    """Validate decoded tone definition data and return {tone_number: definition}
+
+    Each definition holds the tone's lookup info (as in AlertToneLookup) plus a
+    flat 'cadence' list of (type, start_freq, end_freq, duration) segments and
+    a 'phase' mode ('reset' restarts every segment at zero phase, like the
+    built-in tones; 'continuous' carries phase across segments).
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('tones'), dict):
+        raise ToneDefinitionError(f"{source}: expected a top-level 'tones' table")
+
+    definitions = {}
+    for key, spec in data['tones'].items():
+        where = f"{source}: tone {key}"
+        try:
+            tone_number = int(key)
+        except (TypeError, ValueError):
+            raise ToneDefinitionError(f"{where}: tone numbers must be integers")
+        if tone_number < 1:
+            raise ToneDefinitionError(f"{where}: tone numbers must be positive")
+        if not isinstance(spec, dict):
+            raise ToneDefinitionError(f"{where}: expected a table of tone fields")
+        if not isinstance(spec.get('description'), str):
+            raise ToneDefinitionError(f"{where}: 'description' is required")
+        for field in ('frequency', 'dip_switches', 'pattern', 'standard'):
+            if spec.get(field) is not None and not isinstance(spec[field], str):
+                raise ToneDefinitionError(f"{where}: '{field}' must be a string")
+
+        phase = spec.get('phase', 'reset')
+        if phase not in ('reset', 'continuous'):
+            raise ToneDefinitionError(f"{where}: 'phase' must be 'reset' or 'continuous'")
+
+        info = {
+            'frequency': spec.get('frequency', spec['description']),
+            'description': spec['description'],
+            'dip_switches': spec.get('dip_switches'),
+            'pattern': spec.get('pattern', 'custom'),
+            'standard': spec.get('standard'),
+        }
+        definitions[tone_number] = {
+            'info': info,
+            'phase': phase,
+            'cadence': _flatten_cadence(spec.get('cadence'), where),
+        }
+    return definitions
+
+
+def decode_tone_definitions(raw, source):
+    """Decode the bytes of a JSON or TOML tone definition file"""
+    is_toml = source.lower().endswith('.toml')
+    if is_toml and tomllib is None:
+        raise ToneDefinitionError("TOML tone files need Python 3.11+ (tomllib)")
+
+    try:
+        text = raw.decode('utf-8')
+        return tomllib.loads(text) if is_toml else json.loads(text)
+    except ValueError as e:  # UnicodeDecodeError, JSONDecodeError, TOMLDecodeError
+        raise ToneDefinitionError(f"{source}: could not parse tone definitions: {e}")
+
+
+def _burst_cadence(kind, start_freq, end_freq):
+    """0.5s ON/0.5s OFF x 3/1.5s OFF burst cadence (tones 9, 11, 12, 28)"""
+    burst = (kind, start_freq, end_freq, 0.5)
+    return [burst, ('silence', 0.0, 0.0, 0.5), burst, ('silence', 0.0, 0.0, 0.5),
+            burst, ('silence', 0.0, 0.0, 1.5)]
+
+
+# One cadence period per built-in tone, in the flat format of parse_tone_definitions.
+# These mirror the patterns rendered by ToneGenerator.generate_tone_audio and are
+# used wherever a tone is rendered by repeating its period (streams, timelines).
+BUILTIN_CADENCES = {
+    1: [('sine', 970, 970, None)],
+    2: [('sine', 800, 800, 0.25), ('sine', 970, 970, 0.25)],
+    3: [('sweep', 800, 970, 1.0)],
+    4: [('sine', 970, 970, 1.0), ('silence', 0.0, 0.0, 1.0)],
+    5: [('sine', 970, 970, 0.5), ('sine', 630, 630, 0.5)],
+    6: [('sine', 554, 554, 0.1), ('sine', 440, 440, 0.4)],
+    7: [('sweep', 500, 1200, 3.5), ('silence', 0.0, 0.0, 0.5)],
+    8: [('sine', 420, 420, 0.6), ('silence', 0.0, 0.0, 0.6)],
+    9: _burst_cadence('sweep', 1000, 2500),
+    10: [('sine', 550, 550, 1.0), ('sine', 440, 440, 1.0)],
+    11: _burst_cadence('sine', 970, 970),
+    12: _burst_cadence('sine', 2850, 2850),
+    13: [('sweep', 1200, 500, 1.0)],
+    14: [('sine', 400, 400, None)],
+    15: [('sine', 550, 550, 0.7), ('sine', 1000, 1000, 0.33)],
+    16: [('sweep', 1500, 2700, 1.0 / 3.0)],
+    17: [('sine', 750, 750, None)],
+    18: [('sine', 2400, 2400, None)],
+    19: [('sine', 660, 660, None)],
+    20: [('sine', 660, 660, 1.8), ('silence', 0.0, 0.0, 1.8)],
+    21: [('sine', 660, 660, 0.15), ('silence', 0.0, 0.0, 0.15)],
+    22: [('sine', 510, 510, 0.25), ('sine', 610, 610, 0.25)],
+    23: [('sine', 800, 800, 0.5), ('sine', 1000, 1000, 0.5)],
+    24: [('sweep', 250, 1200, 1.0 / 12.0)],
+    25: [('sweep', 500, 1200, 0.5 / 0.33), ('sweep', 1200, 500, 0.5 / 0.33)],
+    26: [('sweep', 2400, 2900, 1.0 / 9.0)],
+    27: [('sweep', 2400, 2900, 1.0 / 3.0)],
+    28: _burst_cadence('sweep', 500, 1200),
+    29: [('sweep', 800, 970, 1.0 / 9.0)],
+    30: [('sweep', 800, 970, 1.0 / 3.0)],
+    31: [('sine', 800, 800, 0.25), ('silence', 0.0, 0.0, 1.0)],
+    32: [('sweep', 500, 1200, 3.75), ('silence', 0.0, 0.0, 0.25)],
+}
+BUILTIN_PHASE_MODES = {25: 'continuous'}  # tone 25 carries phase between up and down sweeps
+
+
+class ToneTimeline:
+    """A sequence of (tone, duration) steps, e.g. an alarm escalation plan
+
+    Steps are added with the chaining methods below; repeat() nests another
+    timeline, optionally forever. Nothing is rendered here - pass the timeline
+    to ToneGenerator.stream_timeline() or play_timeline().
+
+        plan = ToneTimeline().tone(8, 30).silence(1).repeat(ToneTimeline().tone(9, 4.0))
+    """
+
+    def __init__(self, loop=False):
+        self.steps = []
+        self.loop = loop
+
+    @staticmethod
+    def _duration(duration):
+        duration = Fraction(str(duration))
+        if duration < 0:
+            raise ValueError(f"Step duration must not be negative, got {float(duration)}")
+        return duration
+
+    def tone(self, tone_number, duration):
+        """Play a tone for duration seconds"""
+        self.steps.append(('tone', tone_number, self._duration(duration)))
+        return self
+
+    def silence(self, duration):
+        """Insert a silence interval"""
+        self.steps.append(('silence', None, self._duration(duration)))
+        return self
+
+    def voice(self, duration, audio=None):
+        """Reserve a voice message slot, optionally filled with int16 mono audio"""
+        self.steps.append(('voice', audio, self._duration(duration)))
+        return self
+
+    def repeat(self, timeline, count=None):
+        """Repeat another timeline count times (forever if count is None)"""
+        if count is not None and count < 0:
+            raise ValueError(f"Repeat count must not be negative, got {count}")
+        if count is None and not timeline.steps:
+            raise ValueError("Cannot repeat an empty timeline forever")
+        self.steps.append(('repeat', timeline, count))
+        return self
+
+    def iter_steps(self):
+        """Lazily yield flat (kind, tone_number_or_audio, duration) steps
+
+        Raises ValueError instead of spinning when an endless loop or repeat
+        turns out to have zero length.
+        """
+        while True:
+            advanced = False
+            for kind, value, extra in self.steps:
+                if kind != 'repeat':
+                    advanced = advanced or extra > 0
+                    yield kind, value, extra
+                    continue
+                repeats = 0
+                while extra is None or repeats < extra:
+                    repeat_advanced = False
+                    for step in value.iter_steps():
+                        repeat_advanced = repeat_advanced or step[2] > 0
+                        yield step
+                    if extra is None and not repeat_advanced:
+                        raise ValueError("Endless repeat of a zero-length timeline")
+                    advanced = advanced or repeat_advanced
+                    repeats += 1
+            if not self.loop:
+                return
+            if not advanced:
+                raise ValueError("Looping timeline has zero length")
+
+    def total_duration(self):
+        """Total length in seconds, or None if the timeline never ends"""
+        total = self._exact_duration()
+        return None if total is None else float(total)
+
+    def _exact_duration(self):
+        if self.loop:
+            return None
+        total = Fraction(0)
+        for kind, value, extra in self.steps:
+            if kind != 'repeat':
+                total += extra
+                continue
+            inner = value._exact_duration()
+            if extra is None or inner is None:
+                return None
+            total += inner * extra
+        return total
+
+
+class RenderPlan:
+    """Layout of a render as (offset, length, piece) entries, see ToneGenerator.render_plan"""
+    
+    SPAN_FRAMES = 1 << 16  # long continuous tones are split into spans of this size
+    
+    def __init__(self):
+        self.pieces = []
+        self.length = 0
+    
+    def add(self, piece, length):
+        """Append length samples of a piece (a hashable description of what to render)"""
+        self.pieces.append((self.length, length, piece))
+        self.length += length
+    
+    def add_silence(self, length):
+        self.add(('silence',), length)
+
 
 class ToneGenerator:
     """Generate and play audio tones based on the alert tone specifications"""
@@ -313,17 +622,76 @@ class ToneGenerator:
     BURST_PATTERN_DURATION = 2.5  # 3*(0.5) + 1.5 = 2.5s (actual pattern duration)
     BURST_CYCLE_DURATION = 4.5    # Total cycle including gap calculation compatibility
     
-    def __init__(self, sample_rate=44100):
+    MIXER_BUFFER = 1024  # frames per mixer callback
+    
+    def __init__(self, sample_rate=44100, init_mixer=True):
         self.sample_rate = sample_rate
+        self.lookup = AlertToneLookup()
+        self.custom_tones = {}  # tone_number -> one rendered cadence period (int16)
+        self.custom_cadences = {}  # tone_number -> (cadence, phase) for re-rendering
+        self.bank = None
+        self._sounds = {}  # (tone_number, sample_rate) -> pygame Sound of one period
+        self._periods = {}  # rendered built-in periods
+        self._segments = {}  # rendered zero-phase cadence segments, shared across tones
+        
+        self.mixer_channels = 2
         
-        # Initialize pygame mixer for audio playback
+        # Initialize pygame mixer for audio playback (skipped for offline rendering)
+        self.pygame_available = False
+        if not init_mixer:
+            return
         try:
             import pygame
-            pygame.mixer.init(frequency=sample_rate, size=-16, channels=2, buffer=1024)
+            pygame.mixer.init(frequency=sample_rate, size=-16, channels=2, buffer=self.MIXER_BUFFER)
             self.pygame_available = True
         except ImportError:
             print("Warning: pygame not available. Install with: pip install pygame")
-            self.pygame_available = False
+            return
+        except pygame.error as e:
+            print(f"Warning: could not open audio device: {e}")
+            return
+        self._sync_mixer_rate(sample_rate)
+    
+    def _sync_mixer_rate(self, requested):
+        """Render at the rate the mixer actually opened at, so SDL never resamples"""
+        import pygame
+        mixer_rate, _, self.mixer_channels = pygame.mixer.get_init()
+        if mixer_rate != requested:
+            print(f"Mixer is running at {mixer_rate} Hz (requested {requested} Hz), "
+                  f"rendering at {mixer_rate} Hz")
+        if mixer_rate != self.sample_rate:
+            self.set_sample_rate(mixer_rate)
+    
+    def reopen_mixer(self, frequency):
+        """Reopen the mixer (e.g. after switching output device) and follow its rate"""
+        if not self.pygame_available:
+            print("Cannot open mixer: pygame not available")
+            return
+        import pygame
+        pygame.mixer.quit()
+        pygame.mixer.init(frequency=frequency, size=-16, channels=2, buffer=self.MIXER_BUFFER)
+        self._sync_mixer_rate(frequency)
+    
+    def set_sample_rate(self, sample_rate):
+        """Switch the render rate, taking tone periods from the attached bank if it has them"""
+        self.sample_rate = sample_rate
+        self._segments = {}
+        banked = self.bank.periods.get(sample_rate, {}) if self.bank else {}
+        self._periods = {n: period for n, period in banked.items() if n not in self.custom_cadences}
+        for tone_number, (cadence, phase) in self.custom_cadences.items():
+            self.custom_tones[tone_number] = (banked[tone_number] if tone_number in banked
+                                              else self.render_cadence_period(cadence, phase))
+    
+    def use_bank(self, bank):
+        """Attach a ToneBank so rate changes reuse its precomputed periods"""
+        self.bank = bank
+        self.set_sample_rate(self.sample_rate)
+    
+    def _mixer_array(self, audio):
+        """Shape mono int16 audio for pygame.sndarray.make_sound on this mixer"""
+        if self.mixer_channels == 1:
+            return audio
+        return np.column_stack((audio,) * self.mixer_channels)
     
     def generate_sine_wave(self, frequency, duration, amplitude=0.5):
         """Generate a sine wave of specified frequency and duration"""
@@ -345,331 +713,639 @@ class ToneGenerator:
     
     def generate_alternating_tone(self, freq1, freq2, duration1, duration2, total_duration, amplitude=0.5):
         """Generate alternating between two frequencies"""
-        audio_data = np.array([], dtype=np.int16)
+        plan = RenderPlan()
+        self._plan_alternating(plan, freq1, freq2, duration1, duration2, total_duration, amplitude)
+        return self.render_plan(plan)
+    
+    def generate_pulsed_tone(self, frequency, on_duration, off_duration, total_duration, amplitude=0.5):
+        """Generate a pulsed tone (on/off pattern)"""
+        plan = RenderPlan()
+        self._plan_pulsed(plan, frequency, on_duration, off_duration, total_duration, amplitude)
+        return self.render_plan(plan)
+    
+    # Render plans: a tone is first laid out as (offset, length, piece) entries, each
+    # piece rendered independently from a known starting phase, then rendered into
+    # one preallocated array - sequentially, or concurrently with render_plan(workers=N).
+    def _plan_sine(self, plan, frequency, duration, amplitude=0.5):
+        plan.add(('sine', frequency, duration, amplitude), int(duration * self.sample_rate))
+    
+    def _plan_sweep(self, plan, start_freq, end_freq, duration, initial_phase=0, take=None, amplitude=0.5):
+        frames = int(duration * self.sample_rate)
+        piece = ('sweep', start_freq, end_freq, duration, amplitude, initial_phase)
+        plan.add(piece, frames if take is None else min(take, frames))
+    
+    def _plan_continuous(self, plan, frequency, duration, amplitude=0.5):
+        """One long sine, split into spans that render the same samples as one call"""
+        frames = int(duration * self.sample_rate)
+        if frames <= RenderPlan.SPAN_FRAMES:
+            self._plan_sine(plan, frequency, duration, amplitude)
+            return
+        for start in range(0, frames, RenderPlan.SPAN_FRAMES):
+            stop = min(start + RenderPlan.SPAN_FRAMES, frames)
+            plan.add(('sine_span', frequency, duration, amplitude, start, stop), stop - start)
+    
+    def _plan_alternating(self, plan, freq1, freq2, duration1, duration2, total_duration, amplitude=0.5):
         current_time = 0
         use_freq1 = True
         
         while current_time < total_duration:
             if use_freq1:
                 chunk_duration = min(duration1, total_duration - current_time)
-                chunk = self.generate_sine_wave(freq1, chunk_duration, amplitude)
+                self._plan_sine(plan, freq1, chunk_duration, amplitude)
             else:
                 chunk_duration = min(duration2, total_duration - current_time)
-                chunk = self.generate_sine_wave(freq2, chunk_duration, amplitude)
-            
-            audio_data = np.concatenate([audio_data, chunk])
+                self._plan_sine(plan, freq2, chunk_duration, amplitude)
             current_time += chunk_duration
             use_freq1 = not use_freq1
-        
-        return audio_data
     
-    def generate_pulsed_tone(self, frequency, on_duration, off_duration, total_duration, amplitude=0.5):
-        """Generate a pulsed tone (on/off pattern)"""
-        audio_data = np.array([], dtype=np.int16)
+    def _plan_pulsed(self, plan, frequency, on_duration, off_duration, total_duration, amplitude=0.5):
         current_time = 0
         pulse_on = True
         
         while current_time < total_duration:
             if pulse_on:
                 chunk_duration = min(on_duration, total_duration - current_time)
-                chunk = self.generate_sine_wave(frequency, chunk_duration, amplitude)
+                self._plan_sine(plan, frequency, chunk_duration, amplitude)
             else:
                 chunk_duration = min(off_duration, total_duration - current_time)
-                chunk = np.zeros(int(chunk_duration * self.sample_rate), dtype=np.int16)
-            
-            audio_data = np.concatenate([audio_data, chunk])
+                plan.add_silence(int(chunk_duration * self.sample_rate))
             current_time += chunk_duration
             pulse_on = not pulse_on
+    
+    def _plan_sweep_loop(self, plan, start_freq, end_freq, sweep_duration, duration):
+        """Back-to-back sweeps, each restarting at zero phase, the last one cut short"""
+        current_time = 0
         
-        return audio_data
-    
-    def _generate_burst_cycle(self, burst_generator_func, duration, remaining_time_check=1.5):
-        """Helper method for generating 3-burst patterns with 1.5s gaps"""
-        audio_data = np.array([], dtype=np.int16)
-        
-        # Generate 3 bursts with gaps between them
-        for burst in range(3):
-            burst_audio = burst_generator_func()
-            audio_data = np.concatenate([audio_data, burst_audio])
-            # Add 0.5s gap between bursts (not after the last one)
-            if burst < 2:
-                gap = np.zeros(int(0.5 * self.sample_rate), dtype=np.int16)
-                audio_data = np.concatenate([audio_data, gap])
-        
-        # Add 1.5s final gap
-        remaining_time = duration - (len(audio_data) / self.sample_rate)
-        if remaining_time >= remaining_time_check:
-            final_gap = np.zeros(int(remaining_time_check * self.sample_rate), dtype=np.int16)
-            audio_data = np.concatenate([audio_data, final_gap])
-        elif remaining_time > 0:
-            partial_gap = np.zeros(int(remaining_time * self.sample_rate), dtype=np.int16)
-            audio_data = np.concatenate([audio_data, partial_gap])
-        
-        return audio_data
-
-    def generate_tone_audio(self, tone_number, duration=5.0):
-        """Generate audio for a specific tone number"""
-        lookup = AlertToneLookup()
-        tone_data = lookup.get_tone_by_number(tone_number)
+        while current_time < duration:
+            remaining_time = duration - current_time
+            if remaining_time >= sweep_duration:
+                # Full sweep
+                self._plan_sweep(plan, start_freq, end_freq, sweep_duration)
+                current_time += sweep_duration
+            elif remaining_time > 0:
+                # Partial sweep
+                self._plan_sweep(plan, start_freq, end_freq, sweep_duration,
+                                 take=int(remaining_time * self.sample_rate))
+                break
+    
+    def _plan_bursts(self, plan, plan_burst, duration, remaining_time_check=1.5):
+        """3-burst patterns (0.5s gaps) with a 1.5s gap after each group"""
+        cycles = max(1, int(duration / self.BURST_CYCLE_DURATION))
+        
+        for cycle in range(cycles):
+            cycle_start = plan.length
+            cycle_duration = duration - (cycle_start / self.sample_rate)
+            
+            # Generate 3 bursts with gaps between them
+            for burst in range(3):
+                plan_burst(plan)
+                # Add 0.5s gap between bursts (not after the last one)
+                if burst < 2:
+                    plan.add_silence(int(0.5 * self.sample_rate))
+            
+            # Add 1.5s final gap
+            remaining_time = cycle_duration - ((plan.length - cycle_start) / self.sample_rate)
+            if remaining_time >= remaining_time_check:
+                plan.add_silence(int(remaining_time_check * self.sample_rate))
+            elif remaining_time > 0:
+                plan.add_silence(int(remaining_time * self.sample_rate))
+            
+            # Check if we have enough time for another complete cycle
+            if plan.length / self.sample_rate >= duration - self.BURST_CYCLE_DURATION:
+                break
+    
+    def _sweep_phase_advance(self, start_freq, end_freq, duration):
+        """Phase a full sweep adds to its initial phase, exactly as generate_swept_tone computes it"""
+        frames = int(duration * self.sample_rate)
+        t = np.linspace(0, duration, frames)
+        instantaneous_freq = start_freq + (end_freq - start_freq) * t / duration
+        return 2 * np.pi * np.cumsum(instantaneous_freq)[-1] / self.sample_rate
+    
+    def _render_piece(self, piece):
+        kind = piece[0]
+        if kind == 'sine':
+            return self.generate_sine_wave(piece[1], piece[2], piece[3])
+        if kind == 'sweep':
+            _, start_freq, end_freq, duration, amplitude, initial_phase = piece
+            return self.generate_swept_tone(start_freq, end_freq, duration, amplitude, initial_phase)[0]
+        
+        # 'sine_span': samples start..stop of generate_sine_wave(frequency, duration)
+        _, frequency, duration, amplitude, start, stop = piece
+        frames = int(duration * self.sample_rate)
+        t = np.arange(start, stop, dtype=np.float64) * (duration / (frames - 1))
+        if stop == frames:
+            t[-1] = duration  # np.linspace pins its endpoint
+        arr = np.sin(2 * np.pi * frequency * t)
+        return (arr * amplitude * 32767).astype(np.int16)
+    
+    def render_plan(self, plan, workers=None, frames=None):
+        """Render a RenderPlan into one int16 array (optionally trimmed to frames)
+
+        With workers > 1 the plan is split into contiguous runs of pieces that
+        render concurrently into disjoint slices of the output. Every piece is
+        rendered from its planned starting phase, so the result is identical to
+        the sequential render.
+        """
+        frames = plan.length if frames is None else min(frames, plan.length)
+        out = np.zeros(frames, dtype=np.int16)
+        rendered = {}  # identical pieces (repeated bursts, pulses, sweeps) render once
+        
+        def fill(pieces):
+            for offset, length, piece in pieces:
+                length = min(length, frames - offset)
+                if length <= 0 or piece[0] == 'silence':
+                    continue
+                chunk = rendered.get(piece)
+                if chunk is None:
+                    chunk = self._render_piece(piece)
+                    if piece[0] != 'sine_span':
+                        rendered[piece] = chunk
+                out[offset:offset + length] = chunk[:length]
+        
+        if not workers or workers <= 1 or len(plan.pieces) < 2:
+            fill(plan.pieces)
+            return out
+        
+        # Contiguous runs of roughly equal sample counts, a few per worker for balance
+        offsets = np.array([offset for offset, _, _ in plan.pieces])
+        bounds = np.searchsorted(offsets, np.linspace(0, plan.length, workers * 4 + 1)[1:-1])
+        runs = [run for run in np.split(np.arange(len(plan.pieces)), bounds) if len(run)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda run: fill(plan.pieces[run[0]:run[-1] + 1]), runs))
+        return out
+
+    def render_cadence_period(self, cadence, phase='reset', amplitude=0.5, seamless=True):
+        """Render one period of a flat cadence (see parse_tone_definitions)
+
+        In 'continuous' phase mode the whole period is detuned by a fraction of
+        a hertz (under 0.2 Hz for tone 25) so that looping it stays phase-continuous;
+        seamless=False skips that, matching a one-shot render of the cadence.
+        """
+        if len(cadence) == 1 and cadence[0][0] == 'sine' and cadence[0][3] is None:
+            # Continuous tone: shortest whole number of cycles that fits in whole samples
+            freq = cadence[0][1]
+            if freq == int(freq):
+                frames = self.sample_rate // gcd(self.sample_rate, int(freq))
+            else:
+                frames = self.sample_rate
+            n = np.arange(frames)
+            arr = np.sin(2 * np.pi * freq * n / self.sample_rate)
+            return (arr * amplitude * 32767).astype(np.int16)
+
+        detune = 0.0
+        if phase == 'continuous' and seamless:
+            # Shift every segment by one small constant frequency so the period
+            # advances the phase by a whole number of cycles and loops without a click
+            sounding = [segment for segment in cadence if segment[0] != 'silence']
+            frames = sum(int(duration * self.sample_rate) for _, _, _, duration in sounding)
+            cycles = sum(self._sweep_phase_advance(start_freq, end_freq, duration)
+                         for _, start_freq, end_freq, duration in sounding) / (2 * np.pi)
+            if frames:
+                detune = (round(cycles) - cycles) * self.sample_rate / frames
+
+        chunks = []
+        current_phase = 0
+        for kind, start_freq, end_freq, duration in cadence:
+            # Zero-phase segments are shared between cadences (bursts, repeated halves)
+            key = (kind, start_freq, end_freq, duration, amplitude)
+            if phase == 'reset' and key in self._segments:
+                chunks.append(self._segments[key])
+                continue
+
+            if kind == 'silence':
+                chunk = np.zeros(int(duration * self.sample_rate), dtype=np.int16)
+            elif kind == 'sine' and phase == 'reset':
+                chunk = self.generate_sine_wave(start_freq, duration, amplitude)
+            else:
+                chunk, end_phase = self.generate_swept_tone(start_freq + detune, end_freq + detune, duration,
+                                                            amplitude, initial_phase=current_phase)
+                if phase == 'continuous':
+                    current_phase = end_phase
+            if phase == 'reset':
+                self._segments[key] = chunk
+            chunks.append(chunk)
+        return np.concatenate(chunks)
+
+    @staticmethod
+    def _tile_into(out, period, position=0):
+        """Fill out by looping period, starting position samples into it"""
+        n, length = len(out), len(period)
+        if length == 0:
+            out[:] = 0
+            return out
+
+        # Lay down one period rotated by position, then keep doubling the filled prefix
+        head = min(n, length - position)
+        out[:head] = period[position:position + head]
+        wrap = min(n - head, position)
+        out[head:head + wrap] = period[:wrap]
+        filled = min(n, length)
+        while filled < n:
+            count = min(filled, n - filled)
+            out[filled:filled + count] = out[:count]
+            filled += count
+        return out
+
+    def generate_tone_period(self, tone_number):
+        """Return one rendered cadence period of a tone (looping it plays the tone)"""
+        if tone_number in self.custom_tones:
+            return self.custom_tones[tone_number]
+        if tone_number not in self._periods:
+            if tone_number not in BUILTIN_CADENCES:
+                return None
+            self._periods[tone_number] = self.render_cadence_period(
+                BUILTIN_CADENCES[tone_number], BUILTIN_PHASE_MODES.get(tone_number, 'reset'))
+        return self._periods[tone_number]
+
+    def generate_many(self, tone_numbers, duration=5.0, quiet=True):
+        """Render several tones at once into one (n_tones, n_samples) int16 array
+
+        Each row loops the tone's cadence period (see generate_tone_period), so
+        segments shared between tones are rendered once and every row is filled
+        by block copies rather than per-chunk synthesis.
+
+        Rows are equivalent to generate_tone_audio, not sample-identical: any
+        tone may differ, depending on the tone, the duration and the sample
+        rate, so don't swap this in for regression renders without new
+        references. The renders differ because:
+        - every row covers the full duration, where generate_tone_audio can stop short
+        - continuous tones loop whole cycles instead of one long linspace sine
+        - the legacy loops add up float segment times, so their segment
+          boundaries can land a sample away from the looped period's
+        - phase-continuous tones (25) loop a slightly detuned period (see
+          render_cadence_period)
+        """
+        tone_numbers = list(tone_numbers)
+        frames = int(duration * self.sample_rate)
+        out = np.empty((len(tone_numbers), frames), dtype=np.int16)
+        
+        done = {}
+        for row, tone_number in enumerate(tone_numbers):
+            if tone_number in done:
+                out[row] = out[done[tone_number]]
+                continue
+            period = self.generate_tone_period(tone_number)
+            if period is None:
+                raise ValueError(f"Tone #{tone_number} not found")
+            self._tile_into(out[row], period)
+            done[tone_number] = row
+        
+        if not quiet:
+            print(f"Generated {len(tone_numbers)} tones x {duration} seconds")
+        return out
+
+    def export_tone_assets(self, directory, codec='ulaw', duration=None, tone_numbers=None):
+        """Write tones as compact WAV assets (codec: 'ulaw', 'alaw' or 'adpcm')
+
+        With duration=None each file holds one loopable cadence period;
+        otherwise every tone is rendered for duration seconds in one batch.
+        Returns {tone_number: path}.
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'")
+        tone_numbers = sorted(self.lookup.tones) if tone_numbers is None else list(tone_numbers)
+        if duration is None:
+            rows = [self.generate_tone_period(n) for n in tone_numbers]
+        else:
+            rows = self.generate_many(tone_numbers, duration)
+        
+        os.makedirs(directory, exist_ok=True)
+        paths = {}
+        for tone_number, audio in zip(tone_numbers, rows):
+            path = os.path.join(directory, f"tone_{tone_number:02d}_{codec}.wav")
+            size = write_encoded_wav(path, audio, self.sample_rate, codec)
+            print(f"Tone #{tone_number}: {len(audio)} samples -> {size} bytes ({path})")
+            paths[tone_number] = path
+        return paths
+
+    def export_tone_table(self, path, tone_numbers=None):
+        """Write tones' minimal loop units into one firmware-ready binary blob
+
+        Each tone is reduced to the shortest unit that loops to its cadence
+        period (see minimal_repeating_unit), and trailing silence is trimmed:
+        the index records the full loop length, so players pad with zeros.
+        The layout is a TONE_TABLE_HEADER, one TONE_TABLE_ENTRY per tone, then
+        little-endian int16 samples at 4-byte aligned offsets. Prints a size
+        report and returns {tone_number: stored_bytes}.
+        """
+        tone_numbers = sorted(self.lookup.tones) if tone_numbers is None else list(tone_numbers)
+        units = []
+        for tone_number in tone_numbers:
+            period = self.generate_tone_period(tone_number)
+            if period is None:
+                raise ValueError(f"Tone #{tone_number} not found")
+            unit = minimal_repeating_unit(period)
+            stored = len(unit) - (np.flatnonzero(unit[::-1])[:1].tolist() or [len(unit)])[0]
+            units.append((tone_number, len(period), unit[:stored], len(unit)))
+        
+        offset = TONE_TABLE_HEADER.size + TONE_TABLE_ENTRY.size * len(units)
+        index = [TONE_TABLE_HEADER.pack(TONE_TABLE_MAGIC, TONE_TABLE_VERSION, len(units))]
+        data = []
+        sizes = {}
+        for tone_number, period_length, samples, loop_end in units:
+            offset += -offset % 4
+            index.append(TONE_TABLE_ENTRY.pack(tone_number, 0, self.sample_rate, offset, len(samples), 0, loop_end))
+            data.append((offset, samples.astype('<i2').tobytes()))
+            offset += samples.nbytes
+            sizes[tone_number] = samples.nbytes
+            print(f"Tone #{tone_number}: period {period_length} samples, loop {loop_end}, "
+                  f"stored {len(samples)} -> {samples.nbytes} bytes")
+        
+        blob = bytearray(offset)
+        header = b''.join(index)
+        blob[:len(header)] = header
+        for start, raw in data:
+            blob[start:start + len(raw)] = raw
+        with open(path, 'wb') as f:
+            f.write(blob)
+        print(f"Wrote {len(units)} tones at {self.sample_rate} Hz: {len(blob)} bytes ({path})")
+        return sizes
+
+    def stream_timeline(self, timeline, block_size=1024):
+        """Render a ToneTimeline lazily as int16 mono blocks of block_size samples
+
+        Step boundaries are computed from the exact cumulative time of the plan,
+        so transitions land on exact sample boundaries with no drift or gaps.
+        Consecutive steps of the same tone continue its cadence where the last
+        one stopped instead of restarting it. Memory use is constant no matter
+        how long (or endless) the timeline is; the final block may be short.
+        """
+        block = np.zeros(block_size, dtype=np.int16)
+        filled = 0
+        elapsed = Fraction(0)
+        last_tone, position = None, 0
+
+        for kind, value, duration in timeline.iter_steps():
+            start = round(elapsed * self.sample_rate)
+            elapsed += duration
+            remaining = round(elapsed * self.sample_rate) - start
+
+            if kind == 'tone':
+                period = self.generate_tone_period(value)
+                if period is None:
+                    raise ValueError(f"Tone #{value} not found")
+                if not len(period):
+                    period = None
+                if value != last_tone:
+                    position = 0
+                last_tone = value
+                voice_audio = None
+            else:
+                period = None
+                last_tone = None
+                voice_audio = value if kind == 'voice' and value is not None else None
+                voice_position = 0
+
+            while remaining > 0:
+                count = min(remaining, block_size - filled)
+                out = block[filled:filled + count]
+                if period is not None:
+                    self._tile_into(out, period, position)
+                    position = (position + count) % len(period)
+                elif voice_audio is not None and voice_position < len(voice_audio):
+                    chunk = min(count, len(voice_audio) - voice_position)
+                    out[:chunk] = voice_audio[voice_position:voice_position + chunk]
+                    out[chunk:] = 0
+                    voice_position += count
+                else:
+                    out[:] = 0
+                filled += count
+                remaining -= count
+                if filled == block_size:
+                    yield block
+                    block = np.zeros(block_size, dtype=np.int16)
+                    filled = 0
+
+        if filled:
+            yield block[:filled]
+
+    def load_tone_file(self, path, cache_dir=TONE_CACHE_DIR):
+        """Load external tone definitions (JSON or TOML) alongside the built-in tones
+
+        Definitions are validated and compiled to one rendered period per tone.
+        The compiled form is cached in cache_dir, keyed by a hash of the file
+        contents and the sample rate, so unchanged files skip parsing entirely.
+        Pass cache_dir=None to disable the cache. Returns the loaded tone numbers.
+        """
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        cache_key = f"{digest[:24]}-{self.sample_rate}-v{TONE_DEFINITION_FORMAT}"
+        cache_path = os.path.join(cache_dir, f"{cache_key}.npz") if cache_dir else None
+
+        compiled = self._read_tone_cache(cache_path) if cache_path else None
+        if compiled is None:
+            data = decode_tone_definitions(raw, path)
+            definitions = parse_tone_definitions(data, source=path)
+            compiled = {
+                tone_number: (spec, self.render_cadence_period(spec['cadence'], spec['phase']))
+                for tone_number, spec in definitions.items()
+            }
+            for tone_number, (_, period) in compiled.items():
+                if not len(period):
+                    raise ToneDefinitionError(f"{path}: tone {tone_number}: cadence is shorter than one "
+                                              f"sample at {self.sample_rate} Hz")
+            if cache_path:
+                self._write_tone_cache(cache_path, compiled)
+
+        # Refuse the whole file on any collision rather than loading part of it
+        taken = sorted(n for n in compiled if n in self.lookup.tones)
+        if taken:
+            raise ToneDefinitionError(f"{path}: tone(s) {', '.join(f'#{n}' for n in taken)} already defined")
+        for tone_number, (spec, period) in compiled.items():
+            self.lookup.register_tone(tone_number, spec['info'])
+            self.custom_cadences[tone_number] = (spec['cadence'], spec['phase'])
+            self.custom_tones[tone_number] = period
+        return sorted(compiled)
+
+    def _read_tone_cache(self, cache_path):
+        """Load compiled tones from the cache, or None on a miss"""
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                specs = json.loads(str(cached['specs']))
+                for spec in specs.values():
+                    spec['cadence'] = [tuple(segment) for segment in spec['cadence']]
+                return {int(n): (spec, cached[f'period_{n}']) for n, spec in specs.items()}
+        except Exception:  # empty, truncated or foreign files are just a cache miss
+            return None
+
+    def _write_tone_cache(self, cache_path, compiled):
+        """Store compiled tones in the cache (best effort)"""
+        specs = {str(n): spec for n, (spec, _) in compiled.items()}
+        arrays = {f'period_{n}': period for n, (_, period) in compiled.items()}
+        buffer = io.BytesIO()
+        np.savez(buffer, specs=np.array(json.dumps(specs)), **arrays)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: could not write tone cache {cache_path}: {e}")
+
+    def generate_tone_audio(self, tone_number, duration=5.0, quiet=False, workers=None):
+        """Generate audio for a specific tone number
+
+        workers > 1 renders long tones concurrently in cadence-aligned pieces;
+        the output is bit-identical to the sequential render.
+        """
+        tone_data = self.lookup.get_tone_by_number(tone_number)
         
         if not tone_data:
             print(f"Tone #{tone_number} not found")
             return None
         
-        print(f"Generating Tone #{tone_number}: {tone_data['description']}")
+        if not quiet:
+            print(f"Generating Tone #{tone_number}: {tone_data['description']}")
+        
+        if tone_number in self.custom_tones:
+            out = np.empty(int(duration * self.sample_rate), dtype=np.int16)
+            return self._tile_into(out, self.custom_tones[tone_number])
         
-        # Parse the tone specifications and generate appropriate audio
+        plan, frames = self._plan_tone_audio(tone_number, tone_data, duration, quiet)
+        return self.render_plan(plan, workers, frames)
+    
+    def _plan_tone_audio(self, tone_number, tone_data, duration, quiet=False):
+        """Lay out a built-in tone as a RenderPlan; returns (plan, frames to keep or None)"""
+        plan = RenderPlan()
+        trimmed = int(duration * self.sample_rate)
+        
+        # Parse the tone specifications and plan the appropriate audio
         if tone_number == 1:  # 970Hz continuous
-            return self.generate_sine_wave(970, duration)
+            self._plan_continuous(plan, 970, duration)
+            return plan, None
         
         elif tone_number == 2:  # 800Hz/970Hz @ 2Hz
-            return self.generate_alternating_tone(800, 970, 0.25, 0.25, duration)
+            self._plan_alternating(plan, 800, 970, 0.25, 0.25, duration)
+            return plan, None
         
         elif tone_number == 3:  # 800Hz – 970Hz @ 1Hz
             # @ 1Hz means 1 complete sweep per second, so each sweep takes 1 second
-            sweep_duration = 1.0  # 1 second per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 800, 970, 1.0, duration)
+            return plan, trimmed
         
         elif tone_number == 4:  # 970Hz 1s OFF/1s ON
-            return self.generate_pulsed_tone(970, 1.0, 1.0, duration)
+            self._plan_pulsed(plan, 970, 1.0, 1.0, duration)
+            return plan, None
         
         elif tone_number == 5:  # 970Hz, 0.5s/ 630Hz, 0.5s
-            return self.generate_alternating_tone(970, 630, 0.5, 0.5, duration)
+            self._plan_alternating(plan, 970, 630, 0.5, 0.5, duration)
+            return plan, None
         
         elif tone_number == 6:  # 554Hz, 0.1s/ 440Hz, 0.4s (AFNOR)
-            return self.generate_alternating_tone(554, 440, 0.1, 0.4, duration)
+            self._plan_alternating(plan, 554, 440, 0.1, 0.4, duration)
+            return plan, None
         
         elif tone_number == 7:  # 500 – 1200Hz, 3.5s/ 0.5s OFF (Dutch Slow Whoop)
             cycle_duration = 4.0  # 3.5s sweep + 0.5s silence = 4s cycle
             cycles = max(1, int(duration / cycle_duration))
-            audio_data = np.array([], dtype=np.int16)
             
             for cycle in range(cycles):
                 # Add sweep
-                sweep, _ = self.generate_swept_tone(500, 1200, 3.5)
-                audio_data = np.concatenate([audio_data, sweep])
+                self._plan_sweep(plan, 500, 1200, 3.5)
                 
                 # Add silence gap (check remaining time first)
-                remaining_time = duration - (len(audio_data) / self.sample_rate)
+                remaining_time = duration - (plan.length / self.sample_rate)
                 if remaining_time >= 0.5:
-                    silence = np.zeros(int(0.5 * self.sample_rate), dtype=np.int16)
-                    audio_data = np.concatenate([audio_data, silence])
+                    plan.add_silence(int(0.5 * self.sample_rate))
                 elif remaining_time > 0:
                     # Add partial silence if there's remaining time
-                    partial_silence = np.zeros(int(remaining_time * self.sample_rate), dtype=np.int16)
-                    audio_data = np.concatenate([audio_data, partial_silence])
+                    plan.add_silence(int(remaining_time * self.sample_rate))
                     break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
+            return plan, trimmed
         
         elif tone_number == 8:  # 420Hz 0.6s ON/0.6s OFF (AS1670 Alert)
-            return self.generate_pulsed_tone(420, 0.6, 0.6, duration)
+            self._plan_pulsed(plan, 420, 0.6, 0.6, duration)
+            return plan, None
         
         elif tone_number == 9:  # 1000 - 2500Hz, 0.5s/ 0.5s OFF x 3/1.5s OFF (AS1670 Evacuation)
-            cycles = max(1, int(duration / self.BURST_CYCLE_DURATION))
-            audio_data = np.array([], dtype=np.int16)
-            
-            for cycle in range(cycles):
-                # Generate one complete burst cycle
-                burst_cycle = self._generate_burst_cycle(
-                    lambda: self.generate_swept_tone(1000, 2500, 0.5)[0], 
-                    duration - (len(audio_data) / self.sample_rate)
-                )
-                audio_data = np.concatenate([audio_data, burst_cycle])
-                
-                # Check if we have enough time for another complete cycle
-                if len(audio_data) / self.sample_rate >= duration - self.BURST_CYCLE_DURATION:
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
+            self._plan_bursts(plan, lambda p: self._plan_sweep(p, 1000, 2500, 0.5), duration)
+            return plan, trimmed
         
         elif tone_number == 10:  # 550Hz/440Hz @ 0.5Hz
-            return self.generate_alternating_tone(550, 440, 1.0, 1.0, duration)
+            self._plan_alternating(plan, 550, 440, 1.0, 1.0, duration)
+            return plan, None
         
         elif tone_number == 11:  # 970Hz, 0.5s ON/0.5s OFF x 3/ 1.5s OFF (ISO 8201)
-            cycles = max(1, int(duration / self.BURST_CYCLE_DURATION))
-            audio_data = np.array([], dtype=np.int16)
-            
-            for cycle in range(cycles):
-                # Generate one complete burst cycle  
-                burst_cycle = self._generate_burst_cycle(
-                    lambda: self.generate_sine_wave(970, 0.5),
-                    duration - (len(audio_data) / self.sample_rate)
-                )
-                audio_data = np.concatenate([audio_data, burst_cycle])
-                
-                # Check if we have enough time for another complete cycle
-                if len(audio_data) / self.sample_rate >= duration - self.BURST_CYCLE_DURATION:
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
+            self._plan_bursts(plan, lambda p: self._plan_sine(p, 970, 0.5), duration)
+            return plan, trimmed
+        
+        elif tone_number == 12:  # 2850Hz, 0.5s ON/0.5s OFF x 3/1.5s OFF (ISO 8201)
+            # Same pattern as tone 11 but 2850Hz
+            self._plan_bursts(plan, lambda p: self._plan_sine(p, 2850, 0.5), duration)
+            return plan, trimmed
         
         elif tone_number == 13:  # 1200Hz – 500Hz @ 1Hz (DIN 33 404)
             # @ 1Hz means 1 complete sweep per second, so each sweep takes 1 second
-            sweep_duration = 1.0  # 1 second per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(1200, 500, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(1200, 500, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 1200, 500, 1.0, duration)
+            return plan, trimmed
         
         elif tone_number == 14:  # 400Hz continuous
-            return self.generate_sine_wave(400, duration)
+            self._plan_continuous(plan, 400, duration)
+            return plan, None
         
         elif tone_number == 15:  # 550Hz, 0.7s/1000Hz, 0.33s
-            return self.generate_alternating_tone(550, 1000, 0.7, 0.33, duration)
+            self._plan_alternating(plan, 550, 1000, 0.7, 0.33, duration)
+            return plan, None
         
         elif tone_number == 16:  # 1500Hz – 2700Hz @ 3Hz
             # @ 3Hz means 3 complete sweeps per second, so each sweep takes 1/3 second
-            sweep_duration = 1.0 / 3.0  # 0.333 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(1500, 2700, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(1500, 2700, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
-        
-        elif tone_number == 12:  # 2850Hz, 0.5s ON/0.5s OFF x 3/1.5s OFF (ISO 8201)
-            cycles = max(1, int(duration / self.BURST_CYCLE_DURATION))
-            audio_data = np.array([], dtype=np.int16)
-            
-            for cycle in range(cycles):
-                # Generate one complete burst cycle - same pattern as tone 11 but 2850Hz
-                burst_cycle = self._generate_burst_cycle(
-                    lambda: self.generate_sine_wave(2850, 0.5),
-                    duration - (len(audio_data) / self.sample_rate)
-                )
-                audio_data = np.concatenate([audio_data, burst_cycle])
-                
-                # Check if we have enough time for another complete cycle
-                if len(audio_data) / self.sample_rate >= duration - self.BURST_CYCLE_DURATION:
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
-        
-        elif tone_number == 28:  # 500 - 1200Hz, 0.5s/ 0.5s OFF x 3/1.5s OFF (AS1670 Evacuation variant)
-            cycles = max(1, int(duration / self.BURST_CYCLE_DURATION))
-            audio_data = np.array([], dtype=np.int16)
-            
-            for cycle in range(cycles):
-                # Generate one complete burst cycle - same pattern as tone 9 but 500-1200Hz
-                burst_cycle = self._generate_burst_cycle(
-                    lambda: self.generate_swept_tone(500, 1200, 0.5)[0],
-                    duration - (len(audio_data) / self.sample_rate)
-                )
-                audio_data = np.concatenate([audio_data, burst_cycle])
-                
-                # Check if we have enough time for another complete cycle
-                if len(audio_data) / self.sample_rate >= duration - self.BURST_CYCLE_DURATION:
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
+            self._plan_sweep_loop(plan, 1500, 2700, 1.0 / 3.0, duration)
+            return plan, trimmed
         
         elif tone_number == 17:  # 750Hz continuous
-            return self.generate_sine_wave(750, duration)
+            self._plan_continuous(plan, 750, duration)
+            return plan, None
         
         elif tone_number == 18:  # 2400Hz continuous
-            return self.generate_sine_wave(2400, duration)
+            self._plan_continuous(plan, 2400, duration)
+            return plan, None
         
         elif tone_number == 19:  # 660Hz continuous
-            return self.generate_sine_wave(660, duration)
+            self._plan_continuous(plan, 660, duration)
+            return plan, None
         
         elif tone_number == 20:  # 660Hz 1.8s ON/1.8s OFF
-            return self.generate_pulsed_tone(660, 1.8, 1.8, duration)
+            self._plan_pulsed(plan, 660, 1.8, 1.8, duration)
+            return plan, None
         
         elif tone_number == 21:  # 660Hz 0.15s ON/0.15s OFF (fast pulse)
-            return self.generate_pulsed_tone(660, 0.15, 0.15, duration)
+            self._plan_pulsed(plan, 660, 0.15, 0.15, duration)
+            return plan, None
         
         elif tone_number == 22:  # 510Hz, 0.25s/ 610Hz, 0.25s
-            return self.generate_alternating_tone(510, 610, 0.25, 0.25, duration)
+            self._plan_alternating(plan, 510, 610, 0.25, 0.25, duration)
+            return plan, None
         
         elif tone_number == 23:  # 800/1000Hz 0.5s each (1Hz)
-            return self.generate_alternating_tone(800, 1000, 0.5, 0.5, duration)
+            self._plan_alternating(plan, 800, 1000, 0.5, 0.5, duration)
+            return plan, None
         
         elif tone_number == 24:  # 250Hz – 1200Hz @ 12Hz
             # @ 12Hz means 12 complete sweeps per second, so each sweep takes 1/12 second
-            sweep_duration = 1.0 / 12.0  # 0.083 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(250, 1200, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(250, 1200, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 250, 1200, 1.0 / 12.0, duration)
+            return plan, trimmed
         
         elif tone_number == 25:  # 500Hz – 1200Hz @ 0.33Hz
             # @ 0.33Hz means 0.33 cycles per second, so each cycle (up+down) takes 1/0.33 = 3.03 seconds
             # Each half-cycle (up or down) takes 1.515 seconds
             cycle_duration = 1.0 / 0.33  # 3.03 seconds per full cycle
             half_cycle_duration = cycle_duration / 2.0  # 1.515 seconds per half-cycle
-            audio_data = np.array([], dtype=np.int16)
+            # Phase continuity: each sweep starts where the last ended, so the phase
+            # at every sweep boundary follows from the fixed advance of a full sweep
+            up_advance = self._sweep_phase_advance(500, 1200, half_cycle_duration)
+            down_advance = self._sweep_phase_advance(1200, 500, half_cycle_duration)
             current_time = 0
-            current_phase = 0  # Track phase for continuity
+            current_phase = 0
             
             while current_time < duration:
                 remaining_time = duration - current_time
                 
                 # Up sweep: 500Hz to 1200Hz
                 if remaining_time >= half_cycle_duration:
-                    up_sweep, current_phase = self.generate_swept_tone(500, 1200, half_cycle_duration, initial_phase=current_phase)
-                    audio_data = np.concatenate([audio_data, up_sweep])
+                    self._plan_sweep(plan, 500, 1200, half_cycle_duration, current_phase)
+                    current_phase = current_phase + up_advance
                     current_time += half_cycle_duration
                 elif remaining_time > 0:
                     # Partial up sweep - calculate how far through the frequency range we should sweep
@@ -677,126 +1353,55 @@ class ToneGenerator:
                     freq_range = 1200 - 500  # 700Hz range
                     progress = remaining_time / half_cycle_duration  # how far through the sweep (0-1)
                     end_freq = 500 + (freq_range * progress)  # actual end frequency
-                    partial_up_sweep, current_phase = self.generate_swept_tone(500, end_freq, remaining_time, initial_phase=current_phase)
-                    audio_data = np.concatenate([audio_data, partial_up_sweep])
+                    self._plan_sweep(plan, 500, end_freq, remaining_time, current_phase)
                     break
                 
                 remaining_time = duration - current_time
                 
                 # Down sweep: 1200Hz to 500Hz (with phase continuity)
                 if remaining_time >= half_cycle_duration:
-                    down_sweep, current_phase = self.generate_swept_tone(1200, 500, half_cycle_duration, initial_phase=current_phase)
-                    audio_data = np.concatenate([audio_data, down_sweep])
+                    self._plan_sweep(plan, 1200, 500, half_cycle_duration, current_phase)
+                    current_phase = current_phase + down_advance
                     current_time += half_cycle_duration
                 elif remaining_time > 0:
                     # Partial down sweep - calculate how far through the frequency range we should sweep
                     freq_range = 1200 - 500  # 700Hz range
                     progress = remaining_time / half_cycle_duration  # how far through the sweep (0-1)
                     end_freq = 1200 - (freq_range * progress)  # actual end frequency
-                    partial_down_sweep, current_phase = self.generate_swept_tone(1200, end_freq, remaining_time, initial_phase=current_phase)
-                    audio_data = np.concatenate([audio_data, partial_down_sweep])
+                    self._plan_sweep(plan, 1200, end_freq, remaining_time, current_phase)
                     break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            return plan, trimmed
         
         elif tone_number == 26:  # 2400Hz – 2900Hz @ 9Hz
             # @ 9Hz means 9 complete sweeps per second, so each sweep takes 1/9 second
-            sweep_duration = 1.0 / 9.0  # 0.111 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(2400, 2900, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(2400, 2900, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 2400, 2900, 1.0 / 9.0, duration)
+            return plan, trimmed
         
         elif tone_number == 27:  # 2400Hz – 2900Hz @ 3Hz
             # @ 3Hz means 3 complete sweeps per second, so each sweep takes 1/3 second
-            sweep_duration = 1.0 / 3.0  # 0.333 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(2400, 2900, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(2400, 2900, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 2400, 2900, 1.0 / 3.0, duration)
+            return plan, trimmed
         
-        elif tone_number == 31:  # 800Hz, 0.25s ON/1s OFF (short pulse, long gap)
-            return self.generate_pulsed_tone(800, 0.25, 1.0, duration)
+        elif tone_number == 28:  # 500 - 1200Hz, 0.5s/ 0.5s OFF x 3/1.5s OFF (AS1670 Evacuation variant)
+            # Same pattern as tone 9 but 500-1200Hz
+            self._plan_bursts(plan, lambda p: self._plan_sweep(p, 500, 1200, 0.5), duration)
+            return plan, trimmed
         
         elif tone_number == 29:  # 800Hz – 970Hz @ 9Hz
             # @ 9Hz means 9 complete sweeps per second, so each sweep takes 1/9 second
-            sweep_duration = 1.0 / 9.0  # 0.111 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 800, 970, 1.0 / 9.0, duration)
+            return plan, trimmed
         
         elif tone_number == 30:  # 800Hz – 970Hz @ 3Hz
             # @ 3Hz means 3 complete sweeps per second, so each sweep takes 1/3 second
-            sweep_duration = 1.0 / 3.0  # 0.333 seconds per sweep
-            audio_data = np.array([], dtype=np.int16)
-            current_time = 0
-            
-            while current_time < duration:
-                remaining_time = duration - current_time
-                if remaining_time >= sweep_duration:
-                    # Full sweep
-                    sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    audio_data = np.concatenate([audio_data, sweep])
-                    current_time += sweep_duration
-                elif remaining_time > 0:
-                    # Partial sweep
-                    full_sweep, _ = self.generate_swept_tone(800, 970, sweep_duration)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
-                    break
-                    
-            return audio_data[:int(duration * self.sample_rate)]
+            self._plan_sweep_loop(plan, 800, 970, 1.0 / 3.0, duration)
+            return plan, trimmed
+        
+        elif tone_number == 31:  # 800Hz, 0.25s ON/1s OFF (short pulse, long gap)
+            self._plan_pulsed(plan, 800, 0.25, 1.0, duration)
+            return plan, None
         
         elif tone_number == 32:  # 500Hz – 1200Hz, 3.75s/0.25s OFF (AS2220)
-            cycle_duration = 4.0  # 3.75s sweep + 0.25s silence = 4s cycle
-            audio_data = np.array([], dtype=np.int16)
             current_time = 0
             
             while current_time < duration:
@@ -804,38 +1409,32 @@ class ToneGenerator:
                 remaining_time = duration - current_time
                 if remaining_time >= 3.75:
                     # Full sweep
-                    sweep, _ = self.generate_swept_tone(500, 1200, 3.75)
-                    audio_data = np.concatenate([audio_data, sweep])
+                    self._plan_sweep(plan, 500, 1200, 3.75)
                     current_time += 3.75
                 elif remaining_time > 0:
-                    # Partial sweep - generate at normal rate but only take what we need
-                    # Generate a full sweep at normal rate, then trim to remaining time
-                    full_sweep, _ = self.generate_swept_tone(500, 1200, 3.75)
-                    samples_needed = int(remaining_time * self.sample_rate)
-                    partial_sweep = full_sweep[:samples_needed]
-                    audio_data = np.concatenate([audio_data, partial_sweep])
+                    # Partial sweep - the start of a full sweep at the normal rate
+                    self._plan_sweep(plan, 500, 1200, 3.75, take=int(remaining_time * self.sample_rate))
                     break
                 
                 # Add silence gap if there's still time
                 remaining_time = duration - current_time
                 if remaining_time >= 0.25:
-                    silence = np.zeros(int(0.25 * self.sample_rate), dtype=np.int16)
-                    audio_data = np.concatenate([audio_data, silence])
+                    plan.add_silence(int(0.25 * self.sample_rate))
                     current_time += 0.25
                 elif remaining_time > 0:
                     # Partial silence
-                    partial_silence = np.zeros(int(remaining_time * self.sample_rate), dtype=np.int16)
-                    audio_data = np.concatenate([audio_data, partial_silence])
+                    plan.add_silence(int(remaining_time * self.sample_rate))
                     break
-                    
-            return audio_data[:int(duration * self.sample_rate)]  # Trim to exact duration
+            return plan, trimmed
         
         else:
             # Default: generate a simple continuous tone for unimplemented patterns
             # Extract frequency from description
             freq = self.extract_primary_frequency(tone_data['frequency'])
-            print(f"Using simplified continuous tone at {freq}Hz for tone #{tone_number}")
-            return self.generate_sine_wave(freq, duration)
+            if not quiet:
+                print(f"Using simplified continuous tone at {freq}Hz for tone #{tone_number}")
+            self._plan_continuous(plan, freq, duration)
+            return plan, None
     
     def generate_burst_pattern_sweep(self, start_freq, end_freq, sweep_duration, off_duration, bursts, burst_gap):
         """Generate burst pattern with frequency sweeps"""
@@ -861,27 +1460,72 @@ class ToneGenerator:
             return int(match.group(1))
         return 1000  # Default fallback
     
+    def get_sound(self, tone_number):
+        """Return a cached pygame Sound holding one loopable period of a tone"""
+        key = (tone_number, self.sample_rate)
+        if key not in self._sounds:
+            import pygame
+            period = self.generate_tone_period(tone_number)
+            if period is None:
+                raise ValueError(f"Tone #{tone_number} not found")
+            self._sounds[key] = pygame.sndarray.make_sound(self._mixer_array(period))
+        return self._sounds[key]
+    
+    def prewarm(self, tone_numbers=None, workers=4, progress=None):
+        """Render tone periods on a background thread pool; returns a PrewarmJob
+
+        progress, if given, is called as progress(completed, total, tone_number)
+        from the worker threads. Periods land in the same cache play_tone uses.
+        """
+        if tone_numbers is None:
+            tone_numbers = sorted(self.lookup.tones)
+        return PrewarmJob(self, tone_numbers, workers, progress)
+    
     def play_tone(self, tone_number, duration=5.0):
         """Play a specific tone"""
         if not self.pygame_available:
             print("Cannot play audio: pygame not available")
             return
         
-        audio_data = self.generate_tone_audio(tone_number, duration)
-        if audio_data is None:
+        tone_data = self.lookup.get_tone_by_number(tone_number)
+        if not tone_data:
+            print(f"Tone #{tone_number} not found")
             return
         
-        # Convert mono to stereo for pygame
-        stereo_data = np.column_stack((audio_data, audio_data))
-        
-        # Play the audio
+        # Play the audio by looping the tone's cadence period (instant once pre-warmed)
         try:
             import pygame
-            sound = pygame.sndarray.make_sound(stereo_data)
+            sound = self.get_sound(tone_number)
             print(f"Playing tone #{tone_number} for {duration} seconds...")
-            sound.play()
+            # The Sound is shared with VoiceManager: stop only the channel we started
+            channel = sound.play(loops=-1, maxtime=max(1, int(duration * 1000)))
             time.sleep(duration)
-            sound.stop()
+            if channel is not None:
+                channel.stop()
+        except Exception as e:
+            print(f"Error playing audio: {e}")
+    
+    def play_timeline(self, timeline, block_seconds=0.5):
+        """Play a ToneTimeline, queueing blocks on one mixer channel so steps run gap-free"""
+        if not self.pygame_available:
+            print("Cannot play audio: pygame not available")
+            return
+        
+        try:
+            import pygame
+            channel = None
+            block_size = max(1, int(block_seconds * self.sample_rate))
+            for block in self.stream_timeline(timeline, block_size):
+                sound = pygame.sndarray.make_sound(self._mixer_array(block))
+                if channel is None:
+                    channel = sound.play()
+                    continue
+                # Keep exactly one block queued behind the one playing
+                while channel.get_queue() is not None:
+                    time.sleep(block_seconds / 10)
+                channel.queue(sound)
+            while channel is not None and channel.get_busy():
+                time.sleep(block_seconds / 10)
         except Exception as e:
             print(f"Error playing audio: {e}")
     
@@ -895,6 +1539,1216 @@ class ToneGenerator:
                 pass
 
 
+class PrewarmJob:
+    """Background pre-render of tone periods, started by ToneGenerator.prewarm()"""
+    
+    def __init__(self, generator, tone_numbers, workers, progress=None):
+        self.generator = generator
+        self.total = len(tone_numbers)
+        self.completed = 0
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tone-prewarm')
+        self._futures = [executor.submit(self._render, n) for n in tone_numbers]
+        executor.shutdown(wait=False)
+    
+    def _render(self, tone_number):
+        if self._cancelled.is_set():
+            return
+        self.generator.generate_tone_period(tone_number)
+        with self._lock:
+            self.completed += 1
+            completed = self.completed
+        if self.progress:
+            self.progress(completed, self.total, tone_number)
+    
+    def cancel(self):
+        """Stop rendering; tones already rendered stay cached"""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+    
+    def done(self):
+        """True once every tone is rendered or the job was cancelled and has wound down"""
+        return all(future.done() for future in self._futures)
+    
+    def wait(self, timeout=None):
+        """Block until the job finishes (or timeout seconds pass); returns done()"""
+        wait_futures(self._futures, timeout)
+        return self.done()
+
+
+class VoiceManager:
+    """Priority-based voice allocation over reserved pygame mixer channels
+
+    Each tone is prepared once as a looping Sound of its cadence period, so a
+    trigger only picks a channel and starts playback. When every channel is
+    busy the newest trigger preempts the oldest lower-priority voice, and
+    lower-priority voices are ducked while a higher-priority one sounds.
+    Evacuation tones (AlertToneLookup.get_evacuation_tones) outrank the rest.
+    """
+    
+    PRIORITY_EVACUATION = 2
+    PRIORITY_DEFAULT = 1
+    
+    def __init__(self, generator=None, voices=8, duck_volume=0.3):
+        self.generator = generator or ToneGenerator()
+        if not self.generator.pygame_available:
+            raise RuntimeError("VoiceManager needs a working pygame mixer")
+        import pygame
+        
+        # Reserve the first channels so pygame's own Sound.play() never steals them
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), voices))
+        pygame.mixer.set_reserved(voices)
+        self.channels = [pygame.mixer.Channel(i) for i in range(voices)]
+        self.voices = [None] * voices  # per channel: (tone_number, priority, start_order, end_time)
+        self.duck_volume = duck_volume
+        self._order = 0
+        self._lock = threading.RLock()  # timers for timed voices reap from their own threads
+        evacuation = self.generator.lookup.get_evacuation_tones()
+        self.evacuation_tones = {tone['tone_number'] for tone in evacuation}
+    
+    def priority_of(self, tone_number):
+        """Default priority for a tone"""
+        if tone_number in self.evacuation_tones:
+            return self.PRIORITY_EVACUATION
+        return self.PRIORITY_DEFAULT
+    
+    def prepare(self, tone_numbers=None):
+        """Build Sounds ahead of time so the first trigger of each tone is as fast as the rest"""
+        for tone_number in (sorted(self.generator.lookup.tones) if tone_numbers is None else tone_numbers):
+            self.generator.get_sound(tone_number)
+    
+    def _reap(self):
+        """Forget voices that have finished playing or run out their duration, un-ducking if needed"""
+        with self._lock:
+            now = time.monotonic()
+            finished = [i for i, channel in enumerate(self.channels)
+                        if self.voices[i] is not None
+                        and (not channel.get_busy() or (self.voices[i][3] is not None and now >= self.voices[i][3]))]
+            for i in finished:
+                self.channels[i].stop()
+                self.voices[i] = None
+            if finished:
+                self._update_ducking()
+    
+    def _update_ducking(self):
+        """Full volume for the highest active priority, duck everything below it"""
+        active = [voice[1] for voice in self.voices if voice is not None]
+        top = max(active, default=0)
+        for voice, channel in zip(self.voices, self.channels):
+            if voice is not None:
+                channel.set_volume(1.0 if voice[1] == top else self.duck_volume)
+    
+    def trigger(self, tone_number, duration=None, priority=None):
+        """Start a tone (looping until stopped, or for duration seconds)
+
+        Returns the channel index used, or None if every channel holds a voice
+        of equal or higher priority. A timed voice is reaped by a timer when it
+        ends, so voices it ducked come back up without the caller polling.
+        """
+        sound = self.generator.get_sound(tone_number)
+        priority = self.priority_of(tone_number) if priority is None else priority
+        with self._lock:
+            self._reap()
+            
+            if None in self.voices:
+                slot = self.voices.index(None)
+            else:
+                # Preempt the oldest of the lowest-priority voices, if it ranks below us
+                slot = min(range(len(self.voices)), key=lambda i: (self.voices[i][1], self.voices[i][2]))
+                if self.voices[slot][1] >= priority:
+                    return None
+                self.channels[slot].stop()
+            
+            if duration is not None:
+                self.channels[slot].play(sound, loops=-1, maxtime=max(1, int(duration * 1000)))
+                timer = threading.Timer(duration, self._reap)
+                timer.daemon = True
+                timer.start()
+                end_time = time.monotonic() + duration
+            else:
+                self.channels[slot].play(sound, loops=-1)
+                end_time = None
+            self.voices[slot] = (tone_number, priority, self._order, end_time)
+            self._order += 1
+            self._update_ducking()
+        return slot
+    
+    def stop(self, tone_number=None):
+        """Stop every voice playing tone_number (all voices if None)"""
+        with self._lock:
+            for i, voice in enumerate(self.voices):
+                if voice is not None and (tone_number is None or voice[0] == tone_number):
+                    self.channels[i].stop()
+                    self.voices[i] = None
+            self._update_ducking()
+    
+    def active_voices(self):
+        """List (channel, tone_number, priority) for voices still sounding"""
+        with self._lock:
+            self._reap()
+            return [(i, voice[0], voice[1]) for i, voice in enumerate(self.voices) if voice is not None]
+
+
+# Compact codecs: G.711 mu-law/A-law and IMA-ADPCM (WAV block layout)
+_SEG_ULAW_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_SEG_ALAW_END = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+_G711_TABLES = {}
+
+IMA_STEP_TABLE = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767], dtype=np.int32)
+IMA_INDEX_TABLE = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int32)
+IMA_BLOCK_ALIGN = 256  # bytes per mono block, the usual choice at 8 kHz
+
+
+def _build_g711_tables(codec):
+    """Compute the 64K-entry encode and 256-entry decode tables for a G.711 law"""
+    pcm = np.arange(-32768, 32768, dtype=np.int32)
+    if codec == 'ulaw':
+        # ITU-T G.711 mu-law on the top 14 bits
+        value = pcm >> 2
+        mask = np.where(value < 0, 0x7F, 0xFF)
+        value = np.minimum(np.abs(value), 8159) + 0x21
+        seg = np.searchsorted(_SEG_ULAW_END, value)
+        code = (seg << 4) | ((value >> (seg + 1)) & 0x0F)
+        code = np.where(seg >= 8, 0x7F, code) ^ mask
+
+        u = ~np.arange(256, dtype=np.int32) & 0xFF
+        t = (((u & 0x0F) << 3) + 0x84) << ((u & 0x70) >> 4)
+        decoded = np.where(u & 0x80, 0x84 - t, t - 0x84)
+    else:
+        # ITU-T G.711 A-law on the top 13 bits
+        value = pcm >> 3
+        mask = np.where(value >= 0, 0xD5, 0x55)
+        value = np.where(value >= 0, value, -value - 1)
+        seg = np.searchsorted(_SEG_ALAW_END, value)
+        shift = np.where(seg < 2, 1, seg)
+        code = (np.minimum(seg, 7) << 4) | ((value >> shift) & 0x0F)
+        code = np.where(seg >= 8, 0x7F, code) ^ mask
+
+        a = np.arange(256, dtype=np.int32) ^ 0x55
+        seg = (a & 0x70) >> 4
+        t = (a & 0x0F) << 4
+        t = np.where(seg == 0, t + 8, (t + 0x108) << np.maximum(seg - 1, 0))
+        decoded = np.where(a & 0x80, t, -t)
+
+    # Encode table is indexed by the int16 sample reinterpreted as uint16
+    encode = np.empty(65536, dtype=np.uint8)
+    encode[pcm.astype(np.uint16)] = code
+    return encode, decoded.astype(np.int16)
+
+
+def _g711_tables(codec):
+    if codec not in _G711_TABLES:
+        _G711_TABLES[codec] = _build_g711_tables(codec)
+    return _G711_TABLES[codec]
+
+
+def mulaw_encode(samples):
+    """Encode int16 samples to G.711 mu-law bytes (uint8 array)"""
+    return _g711_tables('ulaw')[0][np.asarray(samples, dtype=np.int16).view(np.uint16)]
+
+
+def mulaw_decode(data):
+    """Decode G.711 mu-law bytes to int16 samples"""
+    return _g711_tables('ulaw')[1][np.asarray(data, dtype=np.uint8)]
+
+
+def alaw_encode(samples):
+    """Encode int16 samples to G.711 A-law bytes (uint8 array)"""
+    return _g711_tables('alaw')[0][np.asarray(samples, dtype=np.int16).view(np.uint16)]
+
+
+def alaw_decode(data):
+    """Decode G.711 A-law bytes to int16 samples"""
+    return _g711_tables('alaw')[1][np.asarray(data, dtype=np.uint8)]
+
+
+def ima_samples_per_block(block_align=IMA_BLOCK_ALIGN):
+    """Samples held by one mono IMA-ADPCM block (header sample + two per byte)"""
+    return (block_align - 4) * 2 + 1
+
+
+def _ima_encode_blocks(blocks, index):
+    """Encode a (n_blocks, samples_per_block) array, all blocks in lockstep
+
+    Returns the nibble codes for every sample after the header sample and
+    each block's final step index.
+    """
+    predictor = blocks[:, 0].copy()
+    nibbles = np.empty((len(blocks), blocks.shape[1] - 1), dtype=np.uint8)
+    for i in range(1, blocks.shape[1]):
+        step = IMA_STEP_TABLE[index]
+        diff = blocks[:, i] - predictor
+        code = np.where(diff < 0, 8, 0)
+        diff = np.abs(diff)
+        delta = step >> 3
+        for bit, scale in ((4, 0), (2, 1), (1, 2)):
+            part = step >> scale
+            hit = diff >= part
+            code = code | np.where(hit, bit, 0)
+            diff = diff - np.where(hit, part, 0)
+            delta = delta + np.where(hit, part, 0)
+        predictor = np.clip(np.where(code & 8, predictor - delta, predictor + delta), -32768, 32767)
+        index = np.clip(index + IMA_INDEX_TABLE[code], 0, 88)
+        nibbles[:, i - 1] = code
+    return nibbles, index
+
+
+def ima_adpcm_encode(samples, block_align=IMA_BLOCK_ALIGN):
+    """Encode int16 samples to mono IMA-ADPCM blocks in the WAV layout (uint8 array)
+
+    Each block carries its own predictor header, so blocks are independent and
+    are encoded side by side: the sample loop runs once per block position with
+    every block's state updated in one vectorized step. A first pass finds the
+    step index each block ends on, which seeds the next block's header in the
+    final pass, matching the quality of a sequential encoder. The final block
+    is zero-padded; keep the sample count to trim on decode.
+    """
+    return _ima_adpcm_encode(samples, block_align)[0]
+
+
+def _ima_adpcm_encode(samples, block_align=IMA_BLOCK_ALIGN, initial_index=0):
+    """ima_adpcm_encode with the first block seeded from initial_index
+
+    Also returns the index that seeds the block after the last one, so
+    consecutive chunks encode exactly as one ima_adpcm_encode call would.
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+    per_block = ima_samples_per_block(block_align)
+    n_blocks = max(1, -(-len(samples) // per_block))
+    padded = np.zeros(n_blocks * per_block, dtype=np.int32)
+    padded[:len(samples)] = samples
+    padded = padded.reshape(n_blocks, per_block)
+
+    _, end_index = _ima_encode_blocks(padded, np.zeros(n_blocks, dtype=np.int32))
+    start_index = np.concatenate([[initial_index], end_index[:-1]]).astype(np.int32)
+    nibbles, _ = _ima_encode_blocks(padded, start_index)
+
+    out = np.zeros((n_blocks, block_align), dtype=np.uint8)
+    out[:, 0:2] = padded[:, 0].astype('<i2').view(np.uint8).reshape(n_blocks, 2)
+    out[:, 2] = start_index
+    out[:, 4:] = nibbles[:, 0::2] | (nibbles[:, 1::2] << 4)  # low nibble first
+    return out.ravel(), int(end_index[-1])
+
+
+def ima_adpcm_decode(data, block_align=IMA_BLOCK_ALIGN, n_samples=None):
+    """Decode mono IMA-ADPCM blocks in the WAV layout to int16 samples"""
+    blocks = np.asarray(data, dtype=np.uint8).reshape(-1, block_align)
+    n_blocks = len(blocks)
+    per_block = ima_samples_per_block(block_align)
+
+    predictor = blocks[:, 0:2].copy().view('<i2').ravel().astype(np.int32)
+    index = np.clip(blocks[:, 2].astype(np.int32), 0, 88)
+    packed = blocks[:, 4:]
+    nibbles = np.empty((n_blocks, per_block - 1), dtype=np.int32)
+    nibbles[:, 0::2] = packed & 0x0F
+    nibbles[:, 1::2] = packed >> 4
+
+    out = np.empty((n_blocks, per_block), dtype=np.int16)
+    out[:, 0] = predictor
+    for i in range(1, per_block):
+        code = nibbles[:, i - 1]
+        step = IMA_STEP_TABLE[index]
+        delta = (step >> 3) + np.where(code & 4, step, 0) + np.where(code & 2, step >> 1, 0) \
+            + np.where(code & 1, step >> 2, 0)
+        predictor = np.clip(np.where(code & 8, predictor - delta, predictor + delta), -32768, 32767)
+        index = np.clip(index + IMA_INDEX_TABLE[code], 0, 88)
+        out[:, i] = predictor
+
+    out = out.ravel()
+    return out if n_samples is None else out[:n_samples]
+
+
+CODECS = {
+    # name: (encode, decode, WAV format tag, bits per sample)
+    'ulaw': (mulaw_encode, mulaw_decode, 0x0007, 8),
+    'alaw': (alaw_encode, alaw_decode, 0x0006, 8),
+    'adpcm': (ima_adpcm_encode, ima_adpcm_decode, 0x0011, 4),
+}
+
+
+def encode_stream(blocks, codec):
+    """Encode an iterable of int16 blocks (e.g. stream_timeline output) incrementally
+
+    G.711 blocks are encoded as they arrive; ADPCM input is buffered to whole
+    IMA blocks, with the remainder flushed (zero-padded) at the end. Either
+    way the output matches encoding the whole stream in one call.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'")
+    encode = CODECS[codec][0]
+    if codec != 'adpcm':
+        for block in blocks:
+            yield encode(block)
+        return
+
+    # Carry the step index across chunks so the output doesn't depend on chunking
+    per_block = ima_samples_per_block()
+    pending = np.zeros(0, dtype=np.int16)
+    index = 0
+    for block in blocks:
+        pending = np.concatenate([pending, block])
+        whole = len(pending) - len(pending) % per_block
+        if whole:
+            data, index = _ima_adpcm_encode(pending[:whole], initial_index=index)
+            yield data
+            pending = pending[whole:]
+    if len(pending):
+        yield _ima_adpcm_encode(pending, initial_index=index)[0]
+
+
+def write_encoded_wav(path, samples, sample_rate, codec):
+    """Write int16 mono samples to a WAV file using a compact codec"""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'")
+    encode, _, format_tag, bits = CODECS[codec]
+    data = encode(samples).tobytes()
+
+    if codec == 'adpcm':
+        block_align = IMA_BLOCK_ALIGN
+        per_block = ima_samples_per_block()
+        byte_rate = sample_rate * block_align // per_block
+        extra = struct.pack('<HH', 2, per_block)
+    else:
+        block_align, byte_rate = 1, sample_rate
+        extra = struct.pack('<H', 0)
+
+    fmt = struct.pack('<HHIIHH', format_tag, 1, sample_rate, byte_rate, block_align, bits) + extra
+    fact = struct.pack('<I', len(samples))
+    pad = b'\0' if len(data) % 2 else b''
+    chunks = (b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+              + b'fact' + struct.pack('<I', len(fact)) + fact
+              + b'data' + struct.pack('<I', len(data)) + data + pad)
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks)
+    return len(data)
+
+
+def benchmark_codecs(seconds=600.0, sample_rate=8000):
+    """Time each codec on rendered tone audio and report throughput in MB/s of int16 input"""
+    generator = ToneGenerator(sample_rate, init_mixer=False)
+    audio = generator.generate_many(range(1, 33), seconds / 32).ravel()
+    megabytes = audio.nbytes / 1e6
+    results = {}
+    for name, (encode, decode, _, _) in CODECS.items():
+        decode(encode(audio[:4096]))  # build lookup tables outside the timed runs
+        start = time.perf_counter()
+        encoded = encode(audio)
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        decode(encoded)
+        decode_time = time.perf_counter() - start
+        results[name] = (megabytes / encode_time, megabytes / decode_time)
+        print(f"{name:6s} encode {results[name][0]:8.1f} MB/s   decode {results[name][1]:8.1f} MB/s   "
+              f"({audio.nbytes} -> {encoded.nbytes} bytes)")
+    return results
+
+
+# Firmware tone tables: one blob of minimal loop units with a binary index
+TONE_TABLE_MAGIC = b'KTT1'
+TONE_TABLE_HEADER = struct.Struct('<4sHH')  # magic, version, tone count
+TONE_TABLE_ENTRY = struct.Struct('<HHIIIII')  # tone, reserved, rate, offset, stored, loop start, loop end
+TONE_TABLE_VERSION = 1
+
+
+def minimal_repeating_unit(period):
+    """Return the shortest prefix of period that loops to exactly period"""
+    n = len(period)
+    for length in range(1, n // 2 + 1):
+        if n % length:
+            continue
+        # Cheap rejection on the first repeat before checking every repeat
+        if (np.array_equal(period[length:2 * length], period[:length])
+                and np.array_equal(period.reshape(-1, length), np.broadcast_to(period[:length], (n // length, length)))):
+            return period[:length]
+    return period
+
+
+def load_tone_table(source):
+    """Load a tone table written by ToneGenerator.export_tone_table
+
+    source is a path (memory-mapped read-only) or any buffer such as bytes or
+    an mmap. Samples are int16 views straight into that buffer, nothing is
+    copied. Returns {tone_number: {'samples', 'sample_rate', 'loop_start',
+    'loop_end'}}; samples past len(samples) up to loop_end are silence.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        import mmap
+        with open(source, 'rb') as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count = TONE_TABLE_HEADER.unpack_from(source, 0)
+    if magic != TONE_TABLE_MAGIC or version != TONE_TABLE_VERSION:
+        raise ValueError(f"Not a version {TONE_TABLE_VERSION} tone table")
+    
+    table = {}
+    for i in range(count):
+        tone_number, _, sample_rate, offset, stored, loop_start, loop_end = TONE_TABLE_ENTRY.unpack_from(
+            source, TONE_TABLE_HEADER.size + i * TONE_TABLE_ENTRY.size)
+        table[tone_number] = {
+            'samples': np.frombuffer(source, dtype='<i2', count=stored, offset=offset),
+            'sample_rate': sample_rate,
+            'loop_start': loop_start,
+            'loop_end': loop_end,
+        }
+    return table
+
+
+def tone_table_period(entry):
+    """Expand a tone table entry to one full loop (restoring trimmed silence)"""
+    period = np.zeros(entry['loop_end'], dtype=np.int16)
+    period[:len(entry['samples'])] = entry['samples']
+    return period
+
+
+# Multi-rate render banks
+def resample_poly(samples, up, down, taps_per_phase=32, circular=False, beta=8.6):
+    """Resample int16 audio by up/down with a Kaiser-windowed polyphase FIR
+
+    Every output sample is a dot product of one input window with one filter
+    phase, computed for whole blocks of outputs at once. With circular=True
+    the input is treated as one loop of a periodic signal (a tone period), so
+    the output loops seamlessly too.
+    """
+    common = gcd(up, down)
+    up, down = up // common, down // common
+    if up == down:
+        return np.array(samples, dtype=np.int16)
+    x = np.asarray(samples, dtype=np.float64)
+    
+    # Odd-length linear-phase lowpass at the narrower of the two Nyquist limits.
+    # Its length scales with max(up, down) so decimation gets as many taps per
+    # output sample as interpolation does
+    taps = taps_per_phase * -(-max(up, down) // up)
+    design = taps * up - (1 - (taps * up) % 2)
+    cutoff = 1.0 / max(up, down)
+    t = np.arange(design) - (design - 1) / 2
+    h = np.zeros(taps * up)
+    h[:design] = np.sinc(cutoff * t) * np.kaiser(design, beta)
+    # phases[p, j] multiplies x[base - taps + 1 + j] for upsampled offset p;
+    # each phase is normalised to unity DC gain
+    phases = h.reshape(taps, up).T[:, ::-1]
+    phases = phases / phases.sum(axis=1, keepdims=True)
+    delay = (design - 1) // 2
+    
+    if circular:
+        frames = int(round(len(x) * up / down))
+        pad = np.arange(-taps, len(x) + taps) % max(len(x), 1)
+        padded = x[pad] if len(x) else np.zeros(len(pad))
+    else:
+        frames = -(-len(x) * up // down)
+        padded = np.concatenate([np.zeros(taps), x, np.zeros(taps)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, taps)
+    
+    out = np.empty(frames, dtype=np.float64)
+    block = 65536
+    for start in range(0, frames, block):
+        m = np.arange(start, min(start + block, frames), dtype=np.int64) * down + delay
+        base, phase = m // up, m % up
+        out[start:start + len(m)] = np.einsum('ij,ij->i', windows[base + 1], phases[phase])
+    return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+class ToneBank:
+    """Tone periods precomputed at several sample rates from one master render
+
+    Each period is rendered once at the master generator's rate and
+    polyphase-resampled to every target rate. Attach a bank with
+    ToneGenerator.use_bank() so switching output devices swaps in ready-made
+    periods instead of re-synthesising.
+    """
+    
+    COMMON_RATES = (8000, 16000, 44100, 48000)
+    MASTER_RATE = 96000
+    
+    def __init__(self, rates=COMMON_RATES, master=None, max_loop_seconds=4.0):
+        master = master or ToneGenerator(self.MASTER_RATE, init_mixer=False)
+        self.master_rate = master.sample_rate
+        self.periods = {rate: {} for rate in rates}
+        for tone_number in sorted(master.lookup.tones):
+            period = master.generate_tone_period(tone_number)
+            for rate in rates:
+                self.periods[rate][tone_number] = self._resample_period(period, rate, max_loop_seconds)
+    
+    def _resample_period(self, period, rate, max_loop_seconds):
+        """Resample a period, repeating it first if that makes the loop a whole number of samples"""
+        down = self.master_rate // gcd(rate, self.master_rate)
+        repeats = down // gcd(down, len(period))
+        if repeats * len(period) > max_loop_seconds * self.master_rate:
+            repeats = 1  # accept a loop rounded to the nearest sample
+        return resample_poly(np.tile(period, repeats), rate, self.master_rate, circular=True)
+    
+    def period(self, tone_number, sample_rate):
+        """Return the precomputed period of a tone at sample_rate"""
+        return self.periods[sample_rate][tone_number]
+
+
+class SounderFleet:
+    """Event-driven emulator for a large installation of sounders
+
+    Device state lives in flat NumPy arrays (tone, trigger, fault, sync group,
+    position) and time advances through a heap of scheduled events rather than
+    by polling each device, so thousands of sounders simulate far faster than
+    real time. Sounders sharing a sync group sound their cadence in phase.
+    """
+
+    EVENT_ACTIONS = ('trigger', 'silence', 'fault', 'clear_fault')
+
+    def __init__(self, dip_configs, sync_groups=None, positions=None, generator=None):
+        self.generator = generator or ToneGenerator()
+        lookup = self.generator.lookup
+        by_dip = {dip: lookup.find_tone_by_dip_switches(dip) for dip in set(dip_configs)}
+        unknown = [dip for dip, tone in by_dip.items() if tone is None]
+        if unknown:
+            raise ValueError(f"Unknown DIP switch configuration(s): {', '.join(sorted(unknown))}")
+
+        n = len(dip_configs)
+        self.tone = np.array([by_dip[dip]['tone_number'] for dip in dip_configs], dtype=np.int16)
+        self.triggered = np.zeros(n, dtype=bool)
+        self.faulted = np.zeros(n, dtype=bool)
+        self.start = np.zeros(n, dtype=np.float64)
+        self.group = (np.full(n, -1, dtype=np.int32) if sync_groups is None
+                      else np.asarray(sync_groups, dtype=np.int32))
+        self.positions = (np.zeros((n, 2), dtype=np.float32) if positions is None
+                          else np.asarray(positions, dtype=np.float32))
+        if self.group.shape != (n,):
+            raise ValueError(f"sync_groups must have one entry per sounder ({n}), got shape {self.group.shape}")
+        if self.positions.shape != (n, 2):
+            raise ValueError(f"positions must be {n} (x, y) pairs, got shape {self.positions.shape}")
+        n_groups = int(self.group.max()) + 1 if n and self.group.max() >= 0 else 0
+        self.group_start = np.zeros(n_groups, dtype=np.float64)
+        self.group_active = np.zeros(n_groups, dtype=np.int64)
+
+        self.now = 0.0
+        self._events = []
+        self._sequence = 0
+        self._build_envelopes()
+
+    def __len__(self):
+        return len(self.tone)
+
+    def _build_envelopes(self):
+        """Tabulate each fleet tone's on/off cadence at 1 ms resolution"""
+        sample_rate = self.generator.sample_rate
+        tones = np.unique(self.tone)
+        periods = {int(t): self.generator.generate_tone_period(int(t)) for t in tones}
+        max_ms = max((int(np.ceil(len(p) * 1000 / sample_rate)) for p in periods.values()), default=1)
+
+        self.period_seconds = np.ones(int(tones.max()) + 1 if len(tones) else 1, dtype=np.float64)
+        self.envelopes = np.zeros((len(self.period_seconds), max_ms), dtype=bool)
+        for tone_number, period in periods.items():
+            bins = (np.arange(len(period)) * 1000) // sample_rate
+            self.envelopes[tone_number, :bins[-1] + 1] = np.bincount(bins, weights=period != 0) > 0
+            self.period_seconds[tone_number] = len(period) / sample_rate
+
+    def _targets(self, devices, group):
+        """Resolve an event's device list or sync group to an index array"""
+        if group is not None:
+            return np.flatnonzero(self.group == group)
+        if devices is None:
+            return np.arange(len(self))
+        # Unique indices: a repeated device must count once towards its group
+        targets = np.unique(np.asarray(devices, dtype=np.int64))
+        if len(targets) and (targets[0] < 0 or targets[-1] >= len(self)):
+            raise ValueError(f"Device indices must be in 0..{len(self) - 1}")
+        return targets
+
+    def schedule(self, at, action, devices=None, group=None):
+        """Schedule an action for some devices (all of them by default) at time `at`"""
+        if action not in self.EVENT_ACTIONS:
+            raise ValueError(f"Unknown fleet action '{action}'")
+        if at < self.now:
+            raise ValueError(f"Cannot schedule '{action}' at {at}s, simulation is already at {self.now}s")
+        heapq.heappush(self._events, (at, self._sequence, action, self._targets(devices, group)))
+        self._sequence += 1
+
+    def trigger(self, at, devices=None, group=None):
+        """Start the listed sounders"""
+        self.schedule(at, 'trigger', devices, group)
+
+    def silence(self, at, devices=None, group=None):
+        """Silence the listed sounders"""
+        self.schedule(at, 'silence', devices, group)
+
+    def fault(self, at, devices=None, group=None):
+        """Put the listed sounders into fault (they fall silent)"""
+        self.schedule(at, 'fault', devices, group)
+
+    def clear_fault(self, at, devices=None, group=None):
+        """Clear a fault on the listed sounders"""
+        self.schedule(at, 'clear_fault', devices, group)
+
+    def _apply(self, action, targets):
+        """Apply one event to the device state arrays"""
+        n_groups = len(self.group_active)
+        if action == 'trigger':
+            targets = targets[~self.triggered[targets]]
+            self.start[targets] = self.now
+            grouped = targets[self.group[targets] >= 0]
+            groups = self.group[grouped]
+            # A sounder joining an already sounding sync group picks up the group's phase
+            new_groups = np.unique(groups[self.group_active[groups] == 0])
+            self.group_start[new_groups] = self.now
+            self.start[grouped] = self.group_start[groups]
+            self.group_active += np.bincount(groups, minlength=n_groups)
+            self.triggered[targets] = True
+        elif action == 'silence':
+            targets = targets[self.triggered[targets]]
+            grouped = targets[self.group[targets] >= 0]
+            self.group_active -= np.bincount(self.group[grouped], minlength=n_groups)
+            self.triggered[targets] = False
+        else:
+            self.faulted[targets] = action == 'fault'
+
+    def advance_to(self, t):
+        """Process every event scheduled up to and including time t"""
+        while self._events and self._events[0][0] <= t:
+            at, _, action, targets = heapq.heappop(self._events)
+            self.now = max(self.now, at)
+            self._apply(action, targets)
+        self.now = max(self.now, t)
+
+    def audible(self, t=None):
+        """Boolean array of the sounders producing sound at time t (default: now)"""
+        if t is not None:
+            self.advance_to(t)
+        active = np.flatnonzero(self.triggered & ~self.faulted)
+        tones = self.tone[active]
+        elapsed = (self.now - self.start[active]) % self.period_seconds[tones]
+        ms = np.minimum((elapsed * 1000).astype(np.int64), self.envelopes.shape[1] - 1)
+        result = np.zeros(len(self), dtype=bool)
+        result[active] = self.envelopes[tones, ms]
+        return result
+
+    def states_over_time(self, times):
+        """Advance through sorted times, returning an (n_times, n_devices) on/off array"""
+        return np.array([self.audible(t) for t in times], dtype=bool).reshape(len(times), len(self))
+
+    def render_for_listener(self, position, duration, hearing_radius=50.0, ref_distance=1.0):
+        """Render what a listener at position hears over the next duration seconds
+
+        Only sounders within hearing_radius are mixed, each attenuated by
+        inverse distance. Sounders sharing a tone and cadence start are
+        identical, so each distinct (tone, start) pair is rendered once.
+        The simulation advances to the end of the rendered span.
+        """
+        sample_rate = self.generator.sample_rate
+        frames = int(round(duration * sample_rate))
+        start_time = self.now
+        end_time = start_time + duration
+        mix = np.zeros(frames, dtype=np.float32)
+        scratch = np.empty(frames, dtype=np.int16)
+
+        distance = np.hypot(*(self.positions - np.asarray(position, dtype=np.float32)).T)
+        in_range = distance <= hearing_radius
+        gain = ref_distance / np.maximum(distance, ref_distance)
+
+        cursor = 0
+        while cursor < frames:
+            next_time = self._events[0][0] if self._events and self._events[0][0] < end_time else end_time
+            stop = min(frames, int(round((next_time - start_time) * sample_rate)))
+            if stop > cursor:
+                hearing = np.flatnonzero(self.triggered & ~self.faulted & in_range)
+                keys = np.stack([self.tone[hearing].astype(np.float64), self.start[hearing]], axis=1)
+                unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+                gains = np.bincount(inverse.ravel(), weights=gain[hearing], minlength=len(unique_keys))
+                span_start = start_time + cursor / sample_rate
+                for (tone_number, tone_start), tone_gain in zip(unique_keys, gains):
+                    period = self.generator.generate_tone_period(int(tone_number))
+                    offset = int(round((span_start - tone_start) * sample_rate)) % len(period)
+                    chunk = ToneGenerator._tile_into(scratch[:stop - cursor], period, offset)
+                    mix[cursor:stop] += chunk * np.float32(tone_gain)
+                cursor = stop
+            self.advance_to(next_time)
+
+        self.now = end_time
+        return np.clip(mix, -32768, 32767).astype(np.int16)
+
+
+# Long-run soak testing
+def _current_rss_bytes():
+    """Resident set size of this process, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # peak, not current
+    except ImportError:
+        return None
+
+
+class NullAudioSink:
+    """Discards audio while keeping the sample clock of a real output device"""
+    
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.samples_written = 0
+    
+    def write(self, block):
+        self.samples_written += len(block)
+    
+    def seconds_written(self):
+        return self.samples_written / self.sample_rate
+
+
+def _cadence_onsets(generator, tone_number):
+    """Ideal onsets of a tone's cadence for run_soak
+
+    Returns (cadence_seconds, [(offset_seconds, delay_samples)], gap_samples),
+    where each onset is a sound segment following a silence segment, delay is
+    how far into that segment the rendered period's first non-zero sample
+    sits, and gap is the silent run that marks a real onset rather than a zero
+    crossing. Tones without silence segments have no onsets.
+    """
+    if tone_number in generator.custom_cadences:
+        cadence = generator.custom_cadences[tone_number][0]
+    else:
+        cadence = BUILTIN_CADENCES.get(tone_number, [])
+    if any(duration is None for _, _, _, duration in cadence):
+        return None, [], 0
+    period = generator.generate_tone_period(tone_number)
+    sample_rate = generator.sample_rate
+    
+    onsets = []
+    elapsed, position = Fraction(0), 0
+    for i, (kind, _, _, duration) in enumerate(cadence):
+        if kind != 'silence' and cadence[i - 1][0] == 'silence':
+            sound = np.flatnonzero(period[position:position + int(duration * sample_rate)])
+            if len(sound):
+                onsets.append((elapsed, int(sound[0])))
+        elapsed += Fraction(str(duration))
+        position += int(duration * sample_rate)
+    silences = [int(duration * sample_rate) for kind, _, _, duration in cadence if kind == 'silence']
+    return elapsed, onsets, max(2, min(silences, default=0) // 2)
+
+
+def run_soak(seconds, tone_number=8, block_size=1024, sample_interval=10.0, realtime=True,
+             sample_rate=44100, report=print):
+    """Stream one tone into a NullAudioSink for `seconds` of wall-clock time
+
+    Measures per-block render latency (percentiles to ~4% resolution), missed
+    deadlines (a block not ready by the time the device would need it, with one
+    block of buffering), RSS and tracemalloc growth sampled every
+    sample_interval seconds, and cadence drift: the offset of every tone onset
+    (sound after a cadence silence) from where the ideal sample clock puts it.
+    With realtime=False blocks are rendered back to back instead of being
+    paced to the device clock. Returns the summary as a dict.
+
+    Only the stream path (stream_timeline looping the tone's period) is
+    driven; the per-duration loops of generate_tone_audio, with their float
+    time accumulation, are not exercised here.
+    """
+    import tracemalloc
+    
+    generator = ToneGenerator(sample_rate, init_mixer=False)
+    period = generator.generate_tone_period(tone_number)
+    if period is None:
+        raise ValueError(f"Tone #{tone_number} not found")
+    sink = NullAudioSink(sample_rate)
+    stream = generator.stream_timeline(ToneTimeline(loop=True).tone(tone_number, 3600), block_size)
+    
+    # Ideal onsets: sound segments that follow a silence segment in the cadence
+    cadence_seconds, onsets, gap = _cadence_onsets(generator, tone_number)
+    
+    tracemalloc.start()
+    baseline_snapshot = tracemalloc.take_snapshot()
+    rss_samples = [_current_rss_bytes()]
+    # Fixed log-spaced histogram (1 us .. 10 s) so the harness itself doesn't grow
+    latency_edges = np.geomspace(1e-6, 10.0, 321)
+    latency_counts = np.zeros(len(latency_edges) + 1, dtype=np.int64)
+    worst_latency = 0.0
+    blocks = 0
+    missed = 0
+    onsets_checked = 0
+    max_drift = 0
+    last_drift = 0
+    last_sound = -gap - 1
+    block_seconds = block_size / sample_rate
+    
+    start = time.perf_counter()
+    next_sample_at = start + sample_interval
+    while True:
+        now = time.perf_counter()
+        if now - start >= seconds:
+            break
+        
+        render_start = time.perf_counter()
+        block = next(stream)
+        render_end = time.perf_counter()
+        latency = render_end - render_start
+        latency_counts[np.searchsorted(latency_edges, latency)] += 1
+        worst_latency = max(worst_latency, latency)
+        blocks += 1
+        if realtime and render_end > start + sink.seconds_written() + block_seconds:
+            missed += 1
+        
+        # Cadence drift: an onset is sound after at least `gap` silent samples,
+        # compared with the nearest ideal onset of the cycle it falls in
+        if onsets:
+            sounding = np.flatnonzero(block) + sink.samples_written
+            if len(sounding):
+                previous = np.concatenate([[last_sound], sounding[:-1]])
+                for position in sounding[sounding - previous > gap].tolist():
+                    cycle = position * cadence_seconds.denominator // (cadence_seconds.numerator * sample_rate)
+                    cycle_start = cycle * cadence_seconds
+                    last_drift = min((position - (round((cycle_start + offset) * sample_rate) + delay)
+                                      for offset, delay in onsets), key=abs)
+                    max_drift = max(max_drift, abs(last_drift))
+                    onsets_checked += 1
+                last_sound = int(sounding[-1])
+        sink.write(block)
+        
+        if realtime:
+            # Stay one block ahead of the device clock
+            ahead = start + sink.seconds_written() - block_seconds - time.perf_counter()
+            if ahead > 0:
+                time.sleep(ahead)
+        
+        if time.perf_counter() >= next_sample_at:
+            rss_samples.append(_current_rss_bytes())
+            current, peak = tracemalloc.get_traced_memory()
+            report(f"[{time.perf_counter() - start:7.1f}s] audio {sink.seconds_written():9.1f}s  "
+                   f"RSS {(rss_samples[-1] or 0) / 1e6:7.1f} MB  traced {current / 1e6:6.2f} MB  "
+                   f"missed {missed}  drift {last_drift} samples")
+            next_sample_at += sample_interval
+    
+    wall = time.perf_counter() - start
+    growth = tracemalloc.take_snapshot().compare_to(baseline_snapshot, 'lineno')
+    traced_current, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_samples.append(_current_rss_bytes())
+    
+    def latency_percentile(q):
+        # Upper edge of the bucket holding the q-th percentile, capped at the worst block
+        if not blocks:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(latency_counts), q / 100 * blocks))
+        edge = latency_edges[min(bucket, len(latency_edges) - 1)]
+        return round(min(edge, worst_latency) * 1000, 4)
+    
+    known_rss = [r for r in rss_samples if r is not None]
+    summary = {
+        'tone_number': tone_number,
+        'wall_seconds': round(wall, 2),
+        'audio_seconds': round(sink.seconds_written(), 2),
+        'blocks': blocks,
+        'latency_ms': {'p50': latency_percentile(50), 'p95': latency_percentile(95),
+                       'p99': latency_percentile(99), 'max': round(worst_latency * 1000, 4)},
+        'missed_deadlines': missed,
+        'rss_mb': {'start': round(known_rss[0] / 1e6, 1), 'end': round(known_rss[-1] / 1e6, 1),
+                   'peak': round(max(known_rss) / 1e6, 1)} if known_rss else None,
+        'traced_mb': {'end': round(traced_current / 1e6, 3), 'peak': round(traced_peak / 1e6, 3)},
+        'top_growth': [str(stat) for stat in growth[:5] if stat.size_diff > 0],
+        'onsets_checked': onsets_checked,
+        'max_drift_samples': max_drift,
+        'final_drift_samples': last_drift,
+    }
+    
+    report("=" * 60)
+    report(f"Soak summary: tone #{tone_number}, {summary['wall_seconds']}s wall, "
+           f"{summary['audio_seconds']}s audio in {summary['blocks']} blocks")
+    report(f"Render latency ms: " + ", ".join(f"{k} {v}" for k, v in summary['latency_ms'].items()))
+    report(f"Missed deadlines: {missed}" + ("" if realtime else " (not paced, deadlines not checked)"))
+    if summary['rss_mb']:
+        report(f"RSS MB: start {summary['rss_mb']['start']}, end {summary['rss_mb']['end']}, "
+               f"peak {summary['rss_mb']['peak']}")
+    report(f"Traced Python memory MB: end {summary['traced_mb']['end']}, peak {summary['traced_mb']['peak']}")
+    for line in summary['top_growth']:
+        report(f"  growth: {line}")
+    if onsets:
+        report(f"Cadence drift: {onsets_checked} onsets, max {max_drift} samples, final {last_drift} samples")
+    else:
+        report("Cadence drift: tone has no silent gaps, onsets not measurable")
+    return summary
+
+
+# Render fingerprints for regression checks
+FINGERPRINT_FORMAT = 2
+FINGERPRINT_RATE = 44100
+FINGERPRINT_DURATION = 10.0
+
+
+def fingerprint_tone(generator, tone_number, duration=FINGERPRINT_DURATION):
+    """Compact summary of how a tone renders: hashes, lengths and a few spectral/cadence numbers"""
+    period = generator.generate_tone_period(tone_number)
+    audio = generator.generate_tone_audio(tone_number, duration, quiet=True)
+    sample_rate = generator.sample_rate
+    
+    if len(audio):
+        spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio)))) ** 2
+        freqs = np.fft.rfftfreq(len(audio), 1 / sample_rate)
+        peak_hz = float(freqs[np.argmax(spectrum)])
+        centroid_hz = float((freqs * spectrum).sum() / max(spectrum.sum(), 1e-12))
+        rms = np.sqrt(np.mean(audio.astype(np.float64) ** 2))
+        rms_dbfs = float(20 * np.log10(max(rms, 1e-9) / 32768))
+    else:
+        peak_hz = centroid_hz = 0.0
+        rms_dbfs = -180.0
+    
+    # Cadence: share of 10 ms frames with sound, and ON runs of frames around one
+    # period (per frame, so zero crossings inside a tone don't split a run)
+    frame = sample_rate // 100
+    frames = len(audio) // frame
+    active = np.any(audio[:frames * frame].reshape(frames, frame) != 0, axis=1)
+    period_active = np.logical_or.reduceat(period != 0, np.arange(0, len(period), frame)) if len(period) else period
+    if period_active.all():
+        on_runs = 1 if len(period_active) else 0
+    else:
+        on_runs = int(np.count_nonzero(period_active & ~np.roll(period_active, 1)))
+    
+    return {
+        'period_sha256': hashlib.sha256(period.tobytes()).hexdigest(),
+        'period_samples': int(len(period)),
+        'render_sha256': hashlib.sha256(audio.tobytes()).hexdigest(),
+        'render_samples': int(len(audio)),
+        'peak_hz': round(peak_hz, 1),
+        'centroid_hz': round(centroid_hz, 1),
+        'rms_dbfs': round(rms_dbfs, 2),
+        'duty_cycle': round(float(active.mean()) if frames else 0.0, 3),
+        'on_runs_per_period': on_runs,
+    }
+
+
+def build_fingerprint_manifest(tone_files=(), duration=FINGERPRINT_DURATION):
+    """Fingerprint every tone at the canonical settings (44.1 kHz, offline render)"""
+    generator = ToneGenerator(FINGERPRINT_RATE, init_mixer=False)
+    for path in tone_files:
+        generator.load_tone_file(path, cache_dir=None)
+    return {
+        'format': FINGERPRINT_FORMAT,
+        'sample_rate': FINGERPRINT_RATE,
+        'duration': duration,
+        'numpy': np.__version__,
+        'tones': {str(n): fingerprint_tone(generator, n, duration) for n in sorted(generator.lookup.tones)},
+    }
+
+
+def compare_fingerprint_manifests(expected, actual):
+    """Return {tone_number: [description of each change]} for tones that differ"""
+    changes = {}
+    for key in sorted(set(expected['tones']) | set(actual['tones']), key=int):
+        old, new = expected['tones'].get(key), actual['tones'].get(key)
+        if old is None:
+            changes[int(key)] = ["new tone"]
+        elif new is None:
+            changes[int(key)] = ["tone removed"]
+        else:
+            diffs = []
+            for field in old:
+                if old[field] == new.get(field):
+                    continue
+                if field.endswith('sha256'):
+                    diffs.append(f"{field[:-7]} hash changed")
+                else:
+                    diffs.append(f"{field} {old[field]} -> {new.get(field)}")
+            if diffs:
+                changes[int(key)] = diffs
+    return changes
+
+
+def check_builtin_cadences(sample_rate=FINGERPRINT_RATE):
+    """Check BUILTIN_CADENCES against the generate_tone_audio render of each tone
+
+    The cadence table and the per-tone branches of generate_tone_audio
+    describe the same tones twice, so two cadence periods must match the
+    start of the legacy render: to within 1 LSB (float rounding of
+    segment boundaries) for timed cadences, or 1% of full scale for
+    continuous sines, whose legacy linspace render drifts by a fraction of a
+    sample. Continuous-phase cadences are compared before their loop detune.
+    Returns a list of mismatch descriptions (empty if all agree).
+    """
+    generator = ToneGenerator(sample_rate, init_mixer=False)
+    problems = []
+    for tone_number, cadence in sorted(BUILTIN_CADENCES.items()):
+        # Two periods for timed cadences, so the period length is checked too
+        cycles = cadence * 2 if cadence[0][3] is not None else cadence
+        period = generator.render_cadence_period(cycles, BUILTIN_PHASE_MODES.get(tone_number, 'reset'),
+                                                 seamless=False)
+        seconds = max(10.0, 2 * len(period) / sample_rate)
+        legacy = generator.generate_tone_audio(tone_number, seconds, quiet=True)[:len(period)]
+        if len(legacy) < len(period):
+            problems.append(f"Tone #{tone_number}: legacy render is shorter than two cadence periods")
+            continue
+        tolerance = 327 if cadence[0][3] is None else 1
+        error = int(np.max(np.abs(legacy.astype(np.int32) - period)))
+        if error > tolerance:
+            first = int(np.flatnonzero(np.abs(legacy.astype(np.int32) - period) > tolerance)[0])
+            problems.append(f"Tone #{tone_number}: cadence differs from generate_tone_audio by up to "
+                            f"{error} LSB, from sample {first}")
+    return problems
+
+
+def check_fingerprints(manifest_path, tone_files=()):
+    """Compare a fresh render against a stored manifest, print a report, return True if unchanged"""
+    with open(manifest_path) as f:
+        expected = json.load(f)
+    if expected.get('format') != FINGERPRINT_FORMAT:
+        print(f"❌ {manifest_path}: unsupported fingerprint format {expected.get('format')}")
+        return False
+    
+    actual = build_fingerprint_manifest(tone_files, expected['duration'])
+    if expected.get('numpy') != actual['numpy']:
+        print(f"⚠️  Manifest was made with numpy {expected.get('numpy')}, running {actual['numpy']}")
+    
+    changes = compare_fingerprint_manifests(expected, actual)
+    for tone_number, diffs in changes.items():
+        print(f"Tone #{tone_number}: " + "; ".join(diffs))
+    if changes:
+        print(f"❌ {len(changes)} tone(s) changed")
+    else:
+        print(f"✓ All {len(actual['tones'])} tones match {manifest_path}")
+    
+    # The cadence table must keep describing the same tones as generate_tone_audio
+    cadence_problems = check_builtin_cadences()
+    for problem in cadence_problems:
+        print(problem)
+    if cadence_problems:
+        print(f"❌ {len(cadence_problems)} built-in cadence(s) disagree with generate_tone_audio")
+    else:
+        print(f"✓ All {len(BUILTIN_CADENCES)} built-in cadences match generate_tone_audio")
+    return not changes and not cadence_problems
+
+
+# Local control API
+class ToneControlServer:
+    """Newline-delimited JSON control API on loopback TCP or a Unix socket
+
+    Each request is one JSON object per line with a "cmd" of play, stop,
+    switch, status or list, plus "tone", "duration" and "priority" where they
+    apply and an optional "id" that is echoed back. Every request gets one
+    JSON line in reply. Commands run on the event loop thread, so the
+    VoiceManager is never used concurrently however many clients connect,
+    and every Sound is prepared before the first client is accepted.
+
+    Each reply carries latency_ms, the time from reading the request to the
+    mixer channel playing. Play replies also carry buffer_ms, the mixer
+    output buffer that sits between that point and the speaker.
+    """
+    
+    def __init__(self, generator=None, voices=8):
+        self.generator = generator or ToneGenerator()
+        self.voices = VoiceManager(self.generator, voices)
+        self.voices.prepare()
+        self.buffer_ms = ToneGenerator.MIXER_BUFFER / self.generator.sample_rate * 1000
+        self.stats = {}  # cmd -> [count, total_ms, worst_ms]
+        self.clients = 0
+    
+    @staticmethod
+    def _int_field(request, name, required=False):
+        value = request.get(name)
+        if value is None and not required:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"'{name}' must be an integer")
+        return value
+    
+    def _play(self, request, switch=False):
+        # Validate everything before touching the voice manager
+        tone_number = self._int_field(request, 'tone', required=True)
+        priority = self._int_field(request, 'priority')
+        duration = request.get('duration')
+        if duration is not None and (isinstance(duration, bool) or not isinstance(duration, (int, float))
+                                     or not 0 < duration < float('inf')):
+            raise ValueError("'duration' must be a positive number of seconds")
+        if self.generator.lookup.get_tone_by_number(tone_number) is None:
+            raise ValueError(f"Tone #{tone_number} not found")
+        if switch:
+            # Stop and start in one loop iteration: no gap, no overlap
+            self.voices.stop()
+        slot = self.voices.trigger(tone_number, duration, priority)
+        if slot is None:
+            raise ValueError(f"No free voice for tone #{tone_number}: all held by higher priorities")
+        return {'channel': slot, 'buffer_ms': round(self.buffer_ms, 2)}
+    
+    def _status(self):
+        voices = [{'channel': channel, 'tone': tone_number, 'priority': priority,
+                   'description': self.generator.lookup.tones[tone_number]['description']}
+                  for channel, tone_number, priority in self.voices.active_voices()]
+        latency = {cmd: {'count': count, 'mean_ms': round(total / count, 3), 'max_ms': round(worst, 3)}
+                   for cmd, (count, total, worst) in self.stats.items()}
+        return {'voices': voices, 'clients': self.clients, 'latency': latency}
+    
+    def handle(self, request, received=None):
+        """Run one request dict and return the reply dict"""
+        received = time.perf_counter() if received is None else received
+        cmd = request.get('cmd')
+        try:
+            if cmd == 'play':
+                reply = self._play(request)
+            elif cmd == 'stop':
+                self.voices.stop(self._int_field(request, 'tone'))
+                reply = {}
+            elif cmd == 'switch':
+                reply = self._play(request, switch=True)
+            elif cmd == 'status':
+                reply = self._status()
+            elif cmd == 'list':
+                reply = {'tones': [{'tone': n, **tone} for n, tone in sorted(self.generator.lookup.tones.items())]}
+            else:
+                raise ValueError(f"Unknown command '{cmd}'")
+        except (ValueError, TypeError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        else:
+            reply = {'ok': True, **reply}
+        
+        latency = (time.perf_counter() - received) * 1000
+        if reply['ok']:
+            count, total, worst = self.stats.get(cmd, (0, 0.0, 0.0))
+            self.stats[cmd] = [count + 1, total + latency, max(worst, latency)]
+        reply['latency_ms'] = round(latency, 3)
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+    
+    async def _serve_client(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    reply = {'ok': False, 'error': f"Bad request: {e}"}
+                else:
+                    reply = self.handle(request, received)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+    
+    async def serve(self, host='127.0.0.1', port=8765, path=None):
+        """Accept clients until cancelled (on a Unix socket at path, if given)"""
+        if path:
+            server = await asyncio.start_unix_server(self._serve_client, path)
+            where = path
+        else:
+            server = await asyncio.start_server(self._serve_client, host, port)
+            where = f"{host}:{port}"
+        print(f"Control API listening on {where}")
+        async with server:
+            await server.serve_forever()
+
+
 # Interactive Menu System
 def display_menu():
     """Display the main menu options"""
@@ -904,19 +2758,31 @@ def display_menu():
     print("📋 ALERT TONES (1-32):")
     print("="*60)
 
-def main_menu():
+def main_menu(tone_files=()):
     """Main interactive menu loop"""
-    lookup = AlertToneLookup()
     generator = ToneGenerator()
+    lookup = generator.lookup
     
     if not generator.pygame_available:
         print("⚠️  Warning: Audio not available. Install pygame: pip install pygame numpy")
     
+    for path in tone_files:
+        try:
+            loaded = generator.load_tone_file(path)
+            print(f"Loaded {len(loaded)} custom tone(s) from {path}")
+        except (OSError, ToneDefinitionError) as e:
+            print(f"❌ Could not load {path}: {e}")
+    
+    # Render every tone in the background while the menu is up
+    prewarm = generator.prewarm()
+    
     while True:
         display_menu()
+        if not prewarm.done():
+            print(f"⏳ Preparing tones in the background: {prewarm.completed}/{prewarm.total}")
         
         # Display all tones
-        for i in range(1, 33):
+        for i in sorted(lookup.tones):
             tone = lookup.get_tone_by_number(i)
             if tone:
                 standard = f" [{tone['standard']}]" if tone['standard'] else ""
@@ -925,14 +2791,15 @@ def main_menu():
         
         print("\n" + "="*60)
         try:
-            choice = input("Enter tone number to play (1-32) or 0 to exit: ").strip()
+            choice = input(f"Enter tone number to play (1-{max(lookup.tones)}) or 0 to exit: ").strip()
             
             if choice == '0':
                 print("\n👋 Goodbye!")
+                prewarm.cancel()
                 break
             elif choice.isdigit():
                 tone_num = int(choice)
-                if 1 <= tone_num <= 32:
+                if tone_num in lookup.tones:
                     tone_info = lookup.get_tone_by_number(tone_num)
                     if tone_info:
                         print(f"\nTone #{tone_num}: {tone_info['description']}")
@@ -957,12 +2824,13 @@ def main_menu():
                         generator.play_tone(tone_num, duration)
                         print("✓ Playback complete!")
                 else:
-                    print("❌ Please enter a number between 1 and 32")
+                    print("❌ Please enter a listed tone number")
             else:
                 print("❌ Please enter a valid number")
                 
         except KeyboardInterrupt:
             print("\n\n👋 Goodbye!")
+            prewarm.cancel()
             break
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -970,4 +2838,70 @@ def main_menu():
 
 # Example usage and demonstration
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Klaxon Sonos alert tone simulator")
+    parser.add_argument('--tone-file', action='append', default=[], metavar='PATH',
+                        help="load extra tones from a JSON/TOML definition file (repeatable)")
+    parser.add_argument('--export', metavar='DIR',
+                        help="write every tone as a compact WAV asset to DIR and exit")
+    parser.add_argument('--codec', choices=sorted(CODECS), default='ulaw',
+                        help="codec for --export (default: ulaw)")
+    parser.add_argument('--export-rate', type=int, default=8000, metavar='HZ',
+                        help="sample rate for --export and --tone-table (default: 8000)")
+    parser.add_argument('--export-duration', type=float, metavar='SECONDS',
+                        help="render this long per tone instead of one loopable period")
+    parser.add_argument('--tone-table', metavar='PATH',
+                        help="write every tone's minimal loop into one binary table at PATH and exit")
+    parser.add_argument('--benchmark-codecs', action='store_true',
+                        help="report codec throughput in MB/s and exit")
+    parser.add_argument('--fingerprint', metavar='MANIFEST',
+                        help="fingerprint every tone at canonical settings into MANIFEST (JSON) and exit")
+    parser.add_argument('--check-fingerprints', metavar='MANIFEST',
+                        help="compare current renders against MANIFEST and exit (status 1 on changes)")
+    parser.add_argument('--soak', type=float, metavar='SECONDS',
+                        help="stream a tone into a null sink for SECONDS of wall-clock time and report")
+    parser.add_argument('--soak-tone', type=int, default=8, metavar='N',
+                        help="tone for --soak (default: 8, AS1670 alert)")
+    parser.add_argument('--soak-interval', type=float, default=10.0, metavar='SECONDS',
+                        help="how often --soak samples memory and drift (default: 10)")
+    parser.add_argument('--soak-fast', action='store_true',
+                        help="render --soak blocks back to back instead of pacing to the device clock")
+    parser.add_argument('--serve', action='store_true',
+                        help="run the JSON control API on 127.0.0.1 (see --port, --socket)")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="loopback TCP port for --serve (default: 8765)")
+    parser.add_argument('--socket', metavar='PATH',
+                        help="serve the control API on a Unix socket at PATH instead of TCP")
+    args = parser.parse_args()
+    
+    if args.serve or args.socket:
+        generator = ToneGenerator()
+        for path in args.tone_file:
+            generator.load_tone_file(path)
+        try:
+            asyncio.run(ToneControlServer(generator).serve(port=args.port, path=args.socket))
+        except KeyboardInterrupt:
+            pass
+    elif args.soak:
+        run_soak(args.soak, args.soak_tone, sample_interval=args.soak_interval, realtime=not args.soak_fast)
+    elif args.fingerprint:
+        with open(args.fingerprint, 'w') as f:
+            json.dump(build_fingerprint_manifest(args.tone_file), f, indent=2)
+        print(f"Wrote fingerprints to {args.fingerprint}")
+    elif args.check_fingerprints:
+        raise SystemExit(0 if check_fingerprints(args.check_fingerprints, args.tone_file) else 1)
+    elif args.benchmark_codecs:
+        benchmark_codecs()
+    elif args.export:
+        exporter = ToneGenerator(args.export_rate, init_mixer=False)
+        for path in args.tone_file:
+            exporter.load_tone_file(path)
+        exporter.export_tone_assets(args.export, args.codec, args.export_duration)
+    elif args.tone_table:
+        exporter = ToneGenerator(args.export_rate, init_mixer=False)
+        for path in args.tone_file:
+            exporter.load_tone_file(path)
+        exporter.export_tone_table(args.tone_table)
+    else:
+        main_menu(args.tone_file)
\ No newline at end of file